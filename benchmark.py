@@ -0,0 +1,43 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from utils import BENCHMARK_BASELINE_PATH, BENCHMARKS, compare, results_document, run_benchmarks
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time the rules engine and board generation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 7, 10, 15, 20, 30])
+    parser.add_argument("--pieces", type=int, nargs="+", default=[1, 3, 10, 28], help="dots per player")
+    parser.add_argument("--only", choices=BENCHMARKS, nargs="+", help="run only these benchmarks")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", type=Path, default=BENCHMARK_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fraction slower than the baseline that counts as a regression")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = run_benchmarks(args.sizes, args.pieces, args.only, args.repeats,
+                             lambda result: print(f"{result.key:<36}{result.ns_per_op:>16,.0f} ns"))
+    document = results_document(results)
+    if args.output is not None:
+        args.output.write_text(json.dumps(document, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        print(f"{len(regressions)} regressions against {args.baseline}")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import os
+from dataclasses import fields
+from pathlib import Path
+
+from utils import POLICIES, SettingsData, export_dataset
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the positions of headless self-play games for training")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--player-1", choices=POLICIES, default="random")
+    parser.add_argument("--player-2", choices=POLICIES, default="random")
+    parser.add_argument("--shard-size", type=int, default=1 << 16, help="most positions in one shard")
+    parser.add_argument("--output", type=Path, default=Path("dataset"),
+                        help="directory shards are written to, rerun with the same options to resume")
+    for setting in fields(SettingsData):
+        parser.add_argument(f"--{setting.name.replace('_', '-')}", type=int, default=setting.default)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    settings = SettingsData(**{setting.name: getattr(args, setting.name) for setting in fields(SettingsData)})
+    dataset = export_dataset(args.output, settings, (args.player_1, args.player_2), args.games, args.seed,
+                             args.workers, args.max_turns, args.shard_size)
+    print(f"{len(dataset):,} positions from {dataset.games - dataset.generation_failures:,} games "
+          f"in {len(dataset.shards)} shards under {args.output}")
+
+
+if __name__ == "__main__":
+    main()
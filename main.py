@@ -1,20 +1,50 @@
-from utils import (SCORES_PATH, Game, SettingsData, get_valid_int, import_2d,
-                   show_scores)
+import argparse
+
+from utils import (AlphaBetaBot, EngineProtocol, Game, MCTSBot, ScoreStore,
+                   SettingsData, get_valid_int, show_scores)
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Play Dotto")
+    parser.add_argument("--protocol", action="store_true",
+                        help="speak the engine protocol on stdin/stdout instead of showing the menu")
+    if parser.parse_args().protocol:
+        EngineProtocol().run()
+        return
     settings = SettingsData()
     while True:
         print("===========================\n     Welcome To Dotto!     \n===========================")
-        option = get_valid_int("What would you like to do?\n1) Play\n2) Settings\n3) View Scores\n4) Exit\n", 1, 4)
+        option = get_valid_int("What would you like to do?\n1) Play\n2) Play Against Computer\n3) Settings\n"
+                               "4) View Scores\n5) Exit\n", 1, 5)
         if option == 1:
-            game = Game(settings)
+            try:
+                game = Game(settings)
+            except ValueError as error:
+                # some barrier densities cannot be fitted on every board size, so send the player to the settings
+                print(f"{error}, please change the settings")
+                continue
             game.play()
         elif option == 2:
-            settings.edit()
+            engine = get_valid_int("Which computer would you like to play?\n1) Alpha-Beta\n2) Monte Carlo\n", 1, 2)
+            bot = AlphaBetaBot() if engine == 1 else MCTSBot()
+            try:
+                game = Game(settings, bots={2: bot})
+            except ValueError as error:
+                print(f"{error}, please change the settings")
+                if isinstance(bot, MCTSBot):
+                    bot.close()
+                continue
+            game.play()
+            if isinstance(bot, MCTSBot):
+                bot.close()
         elif option == 3:
-            show_scores(import_2d(SCORES_PATH))
+            settings.edit()
         elif option == 4:
+            store = ScoreStore()
+            print(f"Best scores for {settings.length}x{settings.width} with {settings.num_dots} dots")
+            show_scores(store.top(settings.length, settings.width, settings.num_dots))
+            store.close()
+        elif option == 5:
             break
 
 
@@ -0,0 +1,44 @@
+import argparse
+import time
+from pathlib import Path
+
+from utils import GameRecord
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay or verify recorded Dotto games")
+    parser.add_argument("records", type=Path, nargs="+")
+    parser.add_argument("--turn", type=int, help="show the board at the start of this turn")
+    parser.add_argument("--verify", action="store_true",
+                        help="replay every record headless and report any that no longer reproduce")
+    return parser.parse_args()
+
+
+def verify(paths: list[Path]) -> None:
+    start = time.perf_counter()
+    failures = 0
+    for path in paths:
+        problems = GameRecord.load(path).verify()
+        if problems:
+            failures += 1
+            print(f"{path}:\n  " + "\n  ".join(problems))
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(paths)} games in {elapsed:.2f}s ({len(paths) / elapsed:,.1f} games/s), {failures} failed")
+
+
+def main() -> None:
+    args = parse_args()
+    if args.verify:
+        verify(args.records)
+        return
+    for path in args.records:
+        record = GameRecord.load(path)
+        game = record.replay(args.turn)
+        game.board.show()
+        print(f"{path.name}: turn {game.turn_number} of {len(record.actions)}, Player {game.turn} to move")
+        if game.winner is not None:
+            print(f"Player {game.winner} has won in {game.turn_number} turns!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import argparse
+import asyncio
+
+from utils import DottoServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Host Dotto matches over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(DottoServer(args.host, args.port).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+from dataclasses import asdict, fields
+from pathlib import Path
+
+from utils import POLICIES, Metrics, SettingsData, run_simulation
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Play headless Dotto games between two policies")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="processes to play on, every CPU by default")
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--player-1", choices=POLICIES, default="random")
+    parser.add_argument("--player-2", choices=POLICIES, default="random")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--record", type=Path, help="directory to write a game record of every game to")
+    parser.add_argument("--metrics", type=Path,
+                        help="time each phase of every game and write the metrics here, as Prometheus text "
+                             "if the file ends in .prom and JSON otherwise")
+    parser.add_argument("--batch", action="store_true",
+                        help="play every game at once in one process on the vectorized engine, moves only "
+                             "(random and greedy, reported as random-moves and greedy-moves)")
+    for setting in fields(SettingsData):
+        parser.add_argument(f"--{setting.name.replace('_', '-')}", type=int, default=setting.default)
+    args = parser.parse_args()
+    if args.batch:
+        unsupported = [flag for flag, value in (("--workers", args.workers), ("--record", args.record),
+                                                 ("--metrics", args.metrics)) if value is not None]
+        if unsupported:
+            parser.error(f"--batch cannot be combined with {', '.join(unsupported)}")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    settings = SettingsData(**{setting.name: getattr(args, setting.name) for setting in fields(SettingsData)})
+    metrics = None if args.metrics is None else Metrics()
+    report = run_simulation(settings, (args.player_1, args.player_2), args.games, args.seed,
+                            args.workers or os.cpu_count() or 1, args.max_turns,
+                            args.record, metrics, args.batch)
+    if metrics is not None:
+        args.metrics.write_text(metrics.to_prometheus() if args.metrics.suffix == ".prom" else metrics.to_json())
+    if args.json:
+        print(json.dumps(asdict(report) | {"games_per_second": report.games_per_second}, indent=2))
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
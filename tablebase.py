@@ -0,0 +1,39 @@
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils import TABLEBASE_PATH, Board, SettingsData, board_terrain, build_table
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Solve small endgames by retrograde analysis")
+    parser.add_argument("--size", type=int, nargs=2, default=[5, 5], metavar=("LENGTH", "WIDTH"))
+    parser.add_argument("--pieces", type=int, default=3, help="most pieces left on the board, both sides together")
+    parser.add_argument("--seeds", type=int, nargs="+", help="solve the terrain of the boards these seeds generate "
+                                                            "instead of an open board")
+    parser.add_argument("--output", type=Path, default=TABLEBASE_PATH)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    length, width = args.size
+    if args.seeds is None:
+        terrains = [np.zeros((length, width), dtype=np.int8)]
+    else:
+        settings = SettingsData(length=length, width=width)
+        terrains = [board_terrain(Board.from_settings(settings, random.Random(seed))) for seed in args.seeds]
+    for terrain in terrains:
+        start = time.perf_counter()
+        path, table = build_table(terrain, args.pieces, args.output)
+        values = np.asarray(table.values)
+        print(f"{path.name}: {table.size:,} positions, {(values > 0).sum():,} won, {(values < 0).sum():,} lost, "
+              f"{(values == 0).sum():,} drawn, longest {np.abs(values).max()} plies, "
+              f"{time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
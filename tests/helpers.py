@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import random
+
+from utils import Game, SettingsData, legal_actions
+from utils.board import Board
+
+SETTINGS = SettingsData(length=8, width=9, num_dots=4, num_powerups=5, num_crumblies=8, powerup_frequency=3)
+
+
+def state(game: Game) -> tuple:
+    # everything apply and undo touch, piece order included since legal_actions follows it
+    board = game.board
+    return (board.grid.tobytes(), board.hash, game.state_hash, tuple(board.dot_coords[1]), tuple(board.dot_coords[2]),
+            frozenset(board.crumblies), frozenset(board.powerups), frozenset(board.barriers), tuple(board.portals),
+            game.turn, game.turn_number, game.winner, dict(game.deletes), dict(game.creates),
+            {player: list(items) for player, items in game.inventory.items()}, dict(game.position_counts))
+
+
+def fresh_hash(game: Game) -> int:
+    board = game.board
+    rebuilt = Board(board.grid.copy(), set(board.crumblies), set(board.powerups), set(board.barriers),
+                    list(board.portals))
+    return rebuilt.hash ^ game.compute_state_hash()
+
+
+def games(count: int, settings: SettingsData = SETTINGS) -> list[Game]:
+    return [Game(settings, seed=seed) for seed in range(count)]
+
+
+def random_action(game: Game, rng: random.Random):
+    # conceding ends the game at once, so it is only played when nothing else is legal
+    actions = legal_actions(game)
+    return rng.choice(actions[:-1] or actions)
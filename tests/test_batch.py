@@ -0,0 +1,53 @@
+import random
+
+import numpy as np
+
+from utils import Action, ActionKind, BatchGame, Game, SettingsData, apply
+from utils.constants import MOVE_VECTORS
+from utils.engine import move_actions
+
+# spawns draw from the batch's own generator, so these games never reach one
+SETTINGS = SettingsData(length=7, width=8, num_dots=3, num_powerups=5, num_crumblies=8, powerup_frequency=10**6)
+
+
+def starting_games() -> list[Game]:
+    games = []
+    for seed in range(24):
+        game = Game(SETTINGS, seed=seed)
+        rng = random.Random(seed)
+        if seed % 3 == 0:
+            game.inventory[game.turn].append("Portal")
+            apply(game, Action(ActionKind.PORTAL, tuple(rng.sample(game.board.scan_char_coords("/"), 2))))
+        for coord in rng.sample(game.board.scan_char_coords("/"), 6):
+            game.board.replace_char(coord, " ")
+        games.append(game)
+    return games
+
+
+def test_batch_plays_the_same_moves_as_game():
+    games = starting_games()
+    batch = BatchGame.from_games(games, seed=1)
+    width = SETTINGS.width
+    while True:
+        landings, moves, _ = batch.legal_moves()
+        for index, game in enumerate(games):
+            expected = [] if game.winner is not None else \
+                sorted((action.origin, action.destination) for action in move_actions(game, ActionKind.MOVE, MOVE_VECTORS))
+            directions, origins = np.nonzero(moves[index])
+            assert sorted((divmod(int(origin), width), divmod(int(landings[index, direction, origin]), width))
+                          for direction, origin in zip(directions, origins)) == expected
+        origins, destinations, found = batch.choose_moves((True, False))
+        active = (batch.winner == 0) & found & (batch.turn_number < 150)
+        if not active.any():
+            break
+        batch.step(origins, destinations, active)
+        for index in np.flatnonzero(active):
+            origin, destination = divmod(int(origins[index]), width), divmod(int(destinations[index]), width)
+            apply(games[index], Action(ActionKind.MOVE, (origin, destination)))
+        for index, game in enumerate(games):
+            assert (batch.grid[index] == game.board.grid).all()
+            assert set(map(tuple, np.argwhere(batch.crumbly[index]).tolist())) == game.board.crumblies
+            assert (batch.winner[index], batch.turn[index], batch.turn_number[index]) == \
+                (game.winner or 0, game.turn, game.turn_number)
+            assert batch.inventory[index].sum(axis=1).tolist() == [len(game.inventory[player]) for player in (1, 2)]
+    assert (batch.winner > 0).any()
@@ -0,0 +1,70 @@
+import random
+
+from utils import ActionKind, apply, legal_actions, undo
+from utils.constants import MOVE_VECTORS
+from utils.engine import move_actions
+
+from .helpers import fresh_hash, games, random_action, state
+
+
+def test_undo_restores_every_action():
+    for game in games(6):
+        rng = random.Random(game.seed)
+        while game.winner is None and game.turn_number < 60:
+            before, actions = state(game), legal_actions(game)
+            for action in rng.sample(actions, min(len(actions), 12)):
+                rng_state = game.rng.getstate()
+                record = apply(game, action)
+                undo(game, record)
+                game.rng.setstate(rng_state)
+                assert state(game) == before, action
+                assert legal_actions(game) == actions, action
+            apply(game, random_action(game, rng))
+
+
+def test_undo_unwinds_a_whole_game():
+    for game in games(6):
+        rng = random.Random(game.seed)
+        states, records = [], []
+        while game.winner is None and game.turn_number < 80:
+            states.append(state(game))
+            records.append(apply(game, random_action(game, rng)))
+        for record, expected in zip(reversed(records), reversed(states)):
+            undo(game, record)
+            assert state(game) == expected
+
+
+def test_incremental_hash_matches_a_fresh_one():
+    for game in games(8):
+        rng = random.Random(game.seed)
+        assert game.hash == fresh_hash(game)
+        while game.winner is None and game.turn_number < 80:
+            apply(game, random_action(game, rng))
+            assert game.state_hash == game.compute_state_hash()
+            assert game.hash == fresh_hash(game)
+
+
+def test_reachability_follows_every_change():
+    for game in games(6):
+        rng = random.Random(game.seed)
+        maps, records = game.board.reachability(), []
+
+        def check() -> None:
+            for player in (1, 2):
+                turn, game.turn = game.turn, player
+                game.board.maps = None
+                slid = move_actions(game, ActionKind.MOVE, MOVE_VECTORS)
+                game.board.maps = maps
+                assert move_actions(game, ActionKind.MOVE, MOVE_VECTORS) == slid
+                game.turn = 3 - player
+                captures = {action.destination for action in move_actions(game, ActionKind.MOVE, MOVE_VECTORS)
+                            if action.destination in game.board.dot_coords[player]}
+                game.turn = turn
+                assert {divmod(index, game.board.width) for index in maps.threatened[player]} == captures
+
+        while game.winner is None and game.turn_number < 80:
+            records.append(apply(game, random_action(game, rng)))
+            check()
+        for record in reversed(records):
+            undo(game, record)
+            check()
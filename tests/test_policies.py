@@ -0,0 +1,18 @@
+import random
+from collections import Counter
+
+from utils import ActionKind, Game, SettingsData, is_legal, legal_actions, random_policy
+
+
+def test_random_policy_is_uniform_over_legal_actions():
+    game = Game(SettingsData(length=5, width=5, num_dots=2, num_powerups=0), seed=3)
+    game.inventory[game.turn] += ["Portal", "Destroyer"]
+    actions = [action for action in legal_actions(game) if action.kind is not ActionKind.CONCEDE]
+    rng, draws = random.Random(0), 40 * len(actions)
+    counts = Counter(random_policy(game, rng) for _ in range(draws))
+    assert all(is_legal(game, action) for action in counts)
+    assert set(counts) <= set(actions)
+    portals = sum(count for action, count in counts.items() if action.kind is ActionKind.PORTAL)
+    share = sum(action.kind is ActionKind.PORTAL for action in actions) / len(actions)
+    assert abs(portals / draws - share) < 0.03
+    assert len(counts) > 0.9 * len(actions)
@@ -0,0 +1,56 @@
+import random
+
+from utils import GameRecord, GameWriter, apply
+
+from .helpers import games, random_action, state
+
+
+def record_game(game, path, rng, max_turns=60):
+    writer = GameWriter(path, game, snapshot_interval=4)
+    states = [state(game)]
+    while game.winner is None and game.turn_number < max_turns:
+        action = random_action(game, rng)
+        apply(game, action)
+        writer.record(game, action)
+        states.append(state(game))
+    return writer, states
+
+
+def test_replay_reaches_every_recorded_position(tmp_path):
+    for game in games(4):
+        path = tmp_path / f"{game.seed}.dotr"
+        writer, states = record_game(game, path, random.Random(game.seed))
+        writer.close()
+        record = GameRecord.load(path)
+        assert record.verify() == []
+        assert len(record.actions) == len(states) - 1
+        for turn, expected in enumerate(states, start=1):
+            # repetition counts included, whether the replay starts from a snapshot or from the first turn
+            assert state(record.replay(turn)) == expected
+        replayed = record.replay()
+        assert state(replayed) == states[-1]
+        assert replayed.rng.getstate() == game.rng.getstate()
+
+
+def test_rewound_turns_are_cut_from_the_record(tmp_path):
+    for game in games(4):
+        path = tmp_path / f"{game.seed}.dotr"
+        rng = random.Random(game.seed)
+        writer, states = record_game(game, path, rng, max_turns=30)
+        turns = len(states) - 1
+        if turns < 10:
+            continue
+        writer.rewind(9)
+        writer.file.flush()
+        record = GameRecord.load(path)
+        assert len(record.actions) == turns - 9
+        game = record.replay()
+        assert state(game) == states[-10]
+        while game.winner is None and game.turn_number < 40:
+            action = random_action(game, rng)
+            apply(game, action)
+            writer.record(game, action)
+        writer.close()
+        record = GameRecord.load(path)
+        assert record.verify() == []
+        assert state(record.replay()) == state(game)
@@ -0,0 +1,46 @@
+import random
+
+from utils import History, apply
+
+from .helpers import games, random_action, state
+
+
+def test_every_version_restores_into_a_branch():
+    for game in games(4):
+        rng = random.Random(game.seed)
+        history, states = History(game.snapshot()), [state(game)]
+        while game.winner is None and game.turn_number < 60:
+            action = random_action(game, rng)
+            apply(game, action)
+            history.push(game, action)
+            states.append(state(game))
+        snapshot, expected = history.current, list(states)
+        while snapshot is not None:
+            assert state(game.branch(snapshot)) == expected.pop()
+            snapshot = snapshot.parent
+        assert state(game) == states[-1]
+
+
+def test_undo_and_redo_walk_the_history():
+    for game in games(4):
+        rng = random.Random(game.seed)
+        history, states = History(game.snapshot()), [state(game)]
+        while game.winner is None and game.turn_number < 30:
+            action = random_action(game, rng)
+            apply(game, action)
+            history.push(game, action)
+            states.append(state(game))
+        turns = len(states) - 1
+        for back in range(1, min(turns, 6) + 1):
+            assert len(history.undo(game)) == 1
+            assert state(game) == states[turns - back]
+        history.redo(game)
+        rng_state = game.rng.getstate()
+        assert state(game) == states[turns - min(turns, 6) + 1]
+        # a new move drops the positions that were undone
+        action = random_action(game, rng)
+        apply(game, action)
+        history.push(game, action)
+        assert history.future == []
+        assert state(game.branch(history.current.parent)) == states[turns - min(turns, 6) + 1]
+        assert game.branch(history.current.parent).rng.getstate() == rng_state
@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+
+from utils import ActionKind, Game, SettingsData, apply, legal_actions, undo
+from utils.board import Board
+from utils.constants import Cell
+from utils.tablebase import locate
+
+
+def endgame(rng: random.Random, seed: int) -> Game:
+    # a small board of regular cells, barriers and blanks with two or three pieces and nothing else
+    length, width = rng.choice([(4, 4), (4, 5)])
+    settings = SettingsData(length=length, width=width, num_dots=1, num_powerups=0, num_crumblies=0,
+                            num_deletes=0, num_creates=0, powerup_frequency=10**6)
+    game = Game(settings, seed=seed)
+    grid = np.array([rng.choices((Cell.REGULAR, Cell.BARRIER, Cell.BLANK), (8, 1, 1))[0]
+                     for _ in range(length * width)], dtype=np.uint8).reshape(length, width)
+    free = np.flatnonzero(grid == Cell.REGULAR).tolist()
+    pieces = rng.sample(free, rng.choice((2, 3)))
+    split = rng.randint(1, len(pieces) - 1)
+    grid.flat[pieces[:split]], grid.flat[pieces[split:]] = Cell.O, Cell.X
+    game.board = Board(grid, set(), set(), set(), [])
+    game.turn = rng.choice((1, 2))
+    game.state_hash = game.compute_state_hash()
+    return game
+
+
+def explore(game: Game, value) -> dict[int, tuple[list[int], bool, int]]:
+    # every position reachable by moves: its successors, whether a move takes the last piece, and the table's value
+    graph = {}
+
+    def expand() -> tuple[int, list]:
+        graph[game.hash] = ([], False, value(game))
+        return game.hash, [action for action in legal_actions(game) if action.kind is ActionKind.MOVE]
+
+    stack = [(*expand(), None)]
+    while stack:
+        key, actions, record = stack[-1]
+        if not actions:
+            stack.pop()
+            if record is not None:
+                undo(game, record)
+            continue
+        step = apply(game, actions.pop())
+        if game.winner is not None:
+            graph[key] = (graph[key][0], True, graph[key][2])
+            undo(game, step)
+        elif game.hash in graph:
+            graph[key][0].append(game.hash)
+            undo(game, step)
+        else:
+            graph[key][0].append(game.hash)
+            stack.append((*expand(), step))
+    return graph
+
+
+def solve(graph: dict[int, tuple[list[int], bool, int]]) -> dict[int, int]:
+    # plies to the end, positive when the side to move wins, found layer by layer from the finished positions
+    values = {key: 1 if wins else -1 for key, (children, wins, _) in graph.items() if wins or not children}
+    plies = 2
+    while True:
+        found = {}
+        for key, (children, _, _) in graph.items():
+            if key in values:
+                continue
+            known = [values.get(child) for child in children]
+            if -(plies - 1) in known:
+                found[key] = plies
+            elif None not in known and min(known) > 0 and max(known) == plies - 1:
+                found[key] = -plies
+        if not found:
+            return values
+        values.update(found)
+        plies += 1
+
+
+def test_tables_match_a_search_of_every_reachable_position(tmp_path):
+    rng = random.Random(0)
+    for seed in range(10):
+        game = endgame(rng, seed)
+        found = locate(game, build=True, directory=tmp_path)
+        assert found is not None
+        table, cell = found
+
+        def value(position: Game) -> int:
+            return table.probe(tuple(map(cell, position.board.dot_coords[position.turn])),
+                               tuple(map(cell, position.board.dot_coords[3 - position.turn])))
+
+        graph = explore(game, value)
+        values = solve(graph)
+        for key, (_, _, probed) in graph.items():
+            assert probed == values.get(key, 0)
@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+from dataclasses import asdict, fields
+from pathlib import Path
+
+from utils import Entrant, SettingsData, Tournament, settings_matrix
+
+
+def size(text: str) -> tuple[int, int]:
+    length, _, width = text.partition("x")
+    return int(length), int(width or length)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a Dotto tournament and rate the players")
+    parser.add_argument("players", nargs="+",
+                        help="policy names, or name=policy, or name=engine:<command> for a program "
+                             "speaking the engine protocol, e.g. 'new=engine:python main.py --protocol'")
+    parser.add_argument("--format", choices=("roundrobin", "swiss"), default="roundrobin")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--sizes", type=size, nargs="+", default=[(5, 5)], help="board sizes, e.g. 5x5 7x9")
+    parser.add_argument("--barrier-densities", type=int, nargs="+", default=[SettingsData.barrier_density])
+    parser.add_argument("--powerup-frequencies", type=int, nargs="+", default=[SettingsData.powerup_frequency])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--movetime", type=int, default=100, help="milliseconds per move for engine players")
+    parser.add_argument("--time-limit", type=float, help="seconds after which unfinished games are abandoned")
+    parser.add_argument("--output", type=Path, default=Path("tournament"),
+                        help="directory results are streamed to, rerun with the same options to resume")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    for setting in fields(SettingsData):
+        if setting.name not in ("length", "width", "barrier_density", "powerup_frequency"):
+            parser.add_argument(f"--{setting.name.replace('_', '-')}", type=int, default=setting.default)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    base = SettingsData(**{setting.name: getattr(args, setting.name, setting.default) for setting in fields(SettingsData)})
+    configs = settings_matrix(args.sizes, args.barrier_densities, args.powerup_frequencies, base)
+    entrants = [Entrant.parse(spec, args.movetime) for spec in args.players]
+    tournament = Tournament(entrants, configs, args.output, args.format, args.rounds, args.seed, args.workers,
+                            args.max_turns, args.time_limit)
+    report = tournament.run()
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
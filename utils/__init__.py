@@ -1,5 +1,27 @@
-from .constants import LETTERS, POWERUPS, SCORES_PATH
+from .batch import BatchGame
+from .benchmark import BENCHMARKS, compare, results_document, run_benchmarks
+from .board import Board, generate_boards
+from .bot import AlphaBetaBot, SearchResult
+from .constants import (BENCHMARK_BASELINE_PATH, LETTERS, POWERUPS, SCORES_DB_PATH,
+                        SCORES_PATH, TABLEBASE_PATH)
+from .dataset import Dataset, export_dataset
+from .engine import (Action, ActionKind, Undo, apply, is_legal, legal_actions,
+                     parse_action, undo)
 from .game import Game
+from .mcts import MCTSBot, MCTSResult
+from .metrics import Metrics
 from .other_utils import export_2d, import_2d, show_scores
+from .policies import POLICIES, greedy_policy, random_policy
+from .protocol import EngineProtocol
+from .record import GameWriter
+from .renderer import Renderer
+from .replay import GameRecord
+from .scores import ScoreStore
+from .server import DottoServer
 from .settings_data import SettingsData
+from .simulation import SimulationReport, run_simulation, simulate, simulate_batch
+from .snapshot import History, Snapshot
+from .tablebase import Tablebase, best_action, board_terrain, build_table, probe
+from .tournament import Entrant, Tournament, TournamentReport, settings_matrix
 from .validation_utils import get_valid_int
+from .zobrist import TranspositionTable
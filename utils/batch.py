@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .constants import MOVE_VECTORS, POWERUPS, Cell
+
+if TYPE_CHECKING:
+    from .game import Game
+
+REGULAR, BARRIER, CRUMBLY, POWERUP, PORTAL, BLANK, O, X = (int(cell) for cell in Cell)
+PIECES = np.array([0, O, X], dtype=np.uint8)
+
+
+def slide_stops(grid: np.ndarray, cells: np.ndarray, axis: int, forward: bool) -> tuple[np.ndarray, np.ndarray]:
+    # for each cell, which of cells holds the first non-blank cell strictly beyond it along axis, or -1,
+    # and what that cell holds, a barrier past the edge. Boards are narrow, so stepping along the axis
+    # beats an accumulate over many tiny lines, and carrying the contents along saves a gather afterwards.
+    size = grid.shape[axis]
+    stops = np.full(grid.shape, -1, dtype=np.int16)
+    targets = np.full(grid.shape, BARRIER, dtype=np.uint8)
+    blocking = grid != BLANK
+    step = 1 if forward else -1
+    for index in (range(size - 2, -1, -1) if forward else range(1, size)):
+        here = (slice(None),) * axis + (index,)
+        beyond = (slice(None),) * axis + (index + step,)
+        stops[here], targets[here] = stops[beyond], targets[beyond]
+        np.copyto(stops[here], cells[beyond[1:]], where=blocking[beyond])
+        np.copyto(targets[here], grid[beyond], where=blocking[beyond])
+    return stops, targets
+
+
+@dataclass
+class BatchGame:
+    # K games stepped together, moves only: one (K, length, width) grid of Cell values and per-game state arrays.
+    # Spawns and powerup types come from one numpy generator, so a batch reproduces itself but not a Game's draws.
+    grid: np.ndarray
+    crumbly: np.ndarray
+    partner: np.ndarray
+    inventory: np.ndarray
+    deletes: np.ndarray
+    creates: np.ndarray
+    turn: np.ndarray
+    turn_number: np.ndarray
+    winner: np.ndarray
+    powerup_frequency: int
+    rng: np.random.Generator
+
+    def __post_init__(self) -> None:
+        self.count, self.length, self.width = self.grid.shape
+        self.games = np.arange(self.count)
+        self.cells = np.arange(self.length * self.width, dtype=np.int16).reshape(self.length, self.width)
+
+    @staticmethod
+    def from_games(games: list[Game], seed: int | None = None) -> BatchGame:
+        shapes = {game.board.grid.shape for game in games}
+        frequencies = {game.settings.powerup_frequency for game in games}
+        if len(shapes) != 1 or len(frequencies) != 1:
+            raise ValueError("Batched games must share their board size and powerup frequency")
+        (length, width), count = shapes.pop(), len(games)
+        crumbly = np.zeros((count, length, width), dtype=bool)
+        partner = np.full((count, length * width), -1, dtype=np.int32)
+        inventory = np.zeros((count, 2, len(POWERUPS)), dtype=np.int16)
+        for index, game in enumerate(games):
+            for x, y in game.board.crumblies:
+                crumbly[index, x, y] = True
+            for portal in game.board.portals:
+                (x_1, y_1), (x_2, y_2) = portal.coord_1, portal.coord_2
+                partner[index, x_1 * width + y_1], partner[index, x_2 * width + y_2] = x_2 * width + y_2, x_1 * width + y_1
+            for player in (1, 2):
+                for powerup in game.inventory[player]:
+                    inventory[index, player - 1, POWERUPS.index(powerup)] += 1
+        return BatchGame(np.stack([game.board.grid for game in games]).astype(np.uint8), crumbly, partner, inventory,
+                         np.array([[game.deletes[1], game.deletes[2]] for game in games], dtype=np.int16),
+                         np.array([[game.creates[1], game.creates[2]] for game in games], dtype=np.int16),
+                         np.array([game.turn for game in games], dtype=np.int8),
+                         np.array([game.turn_number for game in games], dtype=np.int32),
+                         np.array([game.winner or 0 for game in games], dtype=np.int8),
+                         frequencies.pop(), np.random.default_rng(seed))
+
+    @property
+    def allies(self) -> np.ndarray:
+        return PIECES[self.turn]
+
+    @property
+    def enemies(self) -> np.ndarray:
+        return PIECES[3 - self.turn]
+
+    def piece_counts(self, player: int) -> np.ndarray:
+        return (self.grid == PIECES[player]).sum(axis=(1, 2))
+
+    def landings(self) -> tuple[np.ndarray, np.ndarray]:
+        # (K, 4, cells): the flat cell a piece on each cell stops on along each of MOVE_VECTORS, or -1, sliding
+        # over blanks exactly as Game.calculate_move does, and what is there
+        stops = [slide_stops(self.grid, self.cells, 2 if dx == 0 else 1, dx + dy > 0) for dx, dy in MOVE_VECTORS]
+        return (np.stack([landings for landings, _ in stops], axis=1).reshape(self.count, len(MOVE_VECTORS), -1),
+                np.stack([targets for _, targets in stops], axis=1).reshape(self.count, len(MOVE_VECTORS), -1))
+
+    def legal_moves(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # landings, which of them are moves for the side to move, and which of those capture
+        cells = self.grid.reshape(self.count, -1)
+        landings, targets = self.landings()
+        allies, enemies = self.allies[:, None, None], self.enemies[:, None, None]
+        moves = (cells[:, None, :] == allies) & (targets != BARRIER) & (targets != allies) & (self.winner == 0)[:, None, None]
+        return landings, moves, moves & (targets == enemies)
+
+    def choose_moves(self, captures_first: tuple[bool, bool] = (True, True)) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # a uniformly random move for every game, only among captures if the side to move prefers them and has one
+        landings, moves, captures = self.legal_moves()
+        moves, captures = moves.reshape(self.count, -1), captures.reshape(self.count, -1)
+        greedy = np.array((False, *captures_first))[self.turn] & captures.any(axis=1)
+        candidates = moves
+        candidates[greedy] = captures[greedy]
+        # every game's candidates lie together in the flat list, so a uniform draw within each run picks one
+        flat = np.flatnonzero(candidates)
+        totals = np.count_nonzero(candidates, axis=1)
+        found = totals > 0
+        picks = np.cumsum(totals) - totals + (self.rng.random(self.count) * totals).astype(np.int64)
+        choice = np.zeros(self.count, dtype=np.int64)
+        choice[found] = flat[picks[found]] % candidates.shape[1]
+        direction, origin = np.divmod(choice, self.length * self.width)
+        return origin, landings[self.games, direction, origin], found
+
+    def step(self, origins: np.ndarray, destinations: np.ndarray, active: np.ndarray) -> None:
+        # plays one move in every active game, as engine.apply plays a Move action
+        games = self.games[active]
+        origins, destinations = origins[active], destinations[active]
+        players = self.turn[games].astype(np.int64)
+        cells, crumbly = self.grid.reshape(self.count, -1), self.crumbly.reshape(self.count, -1)
+        targets = cells[games, destinations]
+        cells[games, origins] = np.where(crumbly[games, origins], BLANK, REGULAR)
+        crumbly[games, origins] = False
+        picked = targets == POWERUP
+        np.add.at(self.inventory, (games[picked], players[picked] - 1,
+                                   self.rng.integers(len(POWERUPS), size=int(picked.sum()))), 1)
+        entered = targets == PORTAL
+        # the portal pair closes and the piece comes out of the other end
+        portal_games, entrances = games[entered], destinations[entered]
+        exits = self.partner[portal_games, entrances]
+        cells[portal_games, entrances] = REGULAR
+        self.partner[portal_games, entrances] = self.partner[portal_games, exits] = -1
+        destinations = destinations.copy()
+        destinations[entered] = exits
+        crumbly[games[targets == CRUMBLY], destinations[targets == CRUMBLY]] = True
+        cells[games, destinations] = PIECES[players]
+        defeated = ~(cells[games] == PIECES[3 - players][:, None]).any(axis=1)
+        self.winner[games[defeated]] = players[defeated]
+        playing = games[~defeated]
+        self.turn[playing] = 3 - self.turn[playing]
+        self.turn_number[playing] += 1
+        self.spawn_powerups(playing[self.turn_number[playing] % self.powerup_frequency == 0])
+
+    def spawn_powerups(self, games: np.ndarray) -> None:
+        cells = self.grid.reshape(self.count, -1)
+        free = cells[games] == REGULAR
+        scores = np.where(free, self.rng.random(free.shape), -1.0)
+        spots = scores.argmax(axis=1)
+        placed = free.any(axis=1)
+        cells[games[placed], spots[placed]] = POWERUP
+
+    def playout(self, max_turns: int, captures_first: tuple[bool, bool] = (True, True)) -> np.ndarray:
+        # plays random moves until each game is won, has no move left or passes max_turns; returns which ended stuck
+        stuck = np.zeros(self.count, dtype=bool)
+        while True:
+            active = (self.winner == 0) & ~stuck & (self.turn_number <= max_turns)
+            if not active.any():
+                return stuck
+            origins, destinations, found = self.choose_moves(captures_first)
+            stuck |= active & ~found
+            self.step(origins, destinations, active & found)
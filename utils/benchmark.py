@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import itertools
+import platform
+import random
+import timeit
+from dataclasses import dataclass
+from typing import Callable
+
+from .batch import BatchGame
+from .board import Board
+from .constants import MOVE_VECTORS, TRIANGLE_NUMBERS
+from .engine import ActionKind, apply, legal_actions, undo
+from .game import Game
+from .settings_data import SettingsData
+
+Operation = Callable[[], object]
+# games per batch in the batched benchmarks, their timings are for the whole batch
+BATCH_SIZE = 1024
+
+
+def scenario_settings(size: int, pieces: int) -> SettingsData:
+    area = size * size
+    return SettingsData(length=size, width=size, num_dots=pieces, num_powerups=area // 15, num_crumblies=area // 10)
+
+
+def pieces_fit(size: int, pieces: int) -> bool:
+    # the two starting triangles must not meet
+    rows = next(i + 1 for i, num in enumerate(TRIANGLE_NUMBERS + [float("inf")]) if pieces <= num)
+    return 2 * rows <= size
+
+
+def scenario_game(size: int, pieces: int, blanks: bool = False) -> Game:
+    game = Game(scenario_settings(size, pieces), seed=size * 1000 + pieces)
+    if blanks:
+        # every free cell becomes a blank, so moves slide across the whole board
+        for coord in game.board.scan_char_coords("/"):
+            game.board.replace_char(coord, " ")
+    return game
+
+
+def board_generation(size: int, pieces: int) -> Operation:
+    settings = scenario_settings(size, pieces)
+    rng = random.Random(0)
+    return lambda: Board.from_settings(settings, rng)
+
+
+def detect_moves(size: int, pieces: int, blanks: bool = False) -> Operation:
+    game = scenario_game(size, pieces, blanks)
+    origins = list(game.board.dot_coords[game.turn])
+
+    def operation() -> None:
+        for origin in origins:
+            game.detect_moves(origin, MOVE_VECTORS)
+    return operation
+
+
+def legal_moves(size: int, pieces: int) -> Operation:
+    game = scenario_game(size, pieces)
+    return lambda: legal_actions(game)
+
+
+def apply_turn(size: int, pieces: int) -> Operation:
+    # a whole turn through the engine: process_move, the defeat check, the side switch and any spawn
+    game = scenario_game(size, pieces)
+    actions = itertools.cycle([action for action in legal_actions(game) if action.kind == ActionKind.MOVE])
+    return lambda: undo(game, apply(game, next(actions)))
+
+
+def batch_moves(size: int, pieces: int) -> Operation:
+    batch = BatchGame.from_games([scenario_game(size, pieces)] * BATCH_SIZE, seed=0)
+    return batch.legal_moves
+
+
+def check_defeat(size: int, pieces: int) -> Operation:
+    return scenario_game(size, pieces).check_defeat
+
+
+BENCHMARKS: dict[str, Callable[[int, int], Operation]] = {
+    "board_generation": board_generation,
+    "detect_moves": detect_moves,
+    "detect_moves_blank": lambda size, pieces: detect_moves(size, pieces, blanks=True),
+    "legal_actions": legal_moves,
+    "apply_turn": apply_turn,
+    "check_defeat": check_defeat,
+    "batch_legal_moves": batch_moves,
+}
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    size: int
+    pieces: int
+    ns_per_op: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}x{self.size},{self.pieces}]"
+
+
+@dataclass
+class Regression:
+    key: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.baseline:,.0f} ns -> {self.current:,.0f} ns ({self.ratio - 1:+.1%})"
+
+
+def time_operation(operation: Operation, repeats: int = 5) -> float:
+    # the fastest of several runs is the least disturbed by the rest of the machine
+    timer = timeit.Timer(operation)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeats, loops)) / loops * 1e9
+
+
+def run_benchmarks(sizes: list[int], piece_counts: list[int], names: list[str] | None = None,
+                   repeats: int = 5, progress: Callable[[BenchmarkResult], None] | None = None) -> list[BenchmarkResult]:
+    results = []
+    for name in names or BENCHMARKS:
+        for size, pieces in itertools.product(sizes, piece_counts):
+            if not pieces_fit(size, pieces):
+                continue
+            result = BenchmarkResult(name, size, pieces, time_operation(BENCHMARKS[name](size, pieces), repeats))
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return results
+
+
+def results_document(results: list[BenchmarkResult]) -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(),
+            "results": {result.key: result.ns_per_op for result in results}}
+
+
+def compare(results: list[BenchmarkResult], baseline: dict, threshold: float = 0.2) -> list[Regression]:
+    previous = baseline["results"]
+    return [Regression(result.key, previous[result.key], result.ns_per_op) for result in results
+            if result.key in previous and result.ns_per_op > previous[result.key] * (1 + threshold)]
@@ -2,127 +2,358 @@ from __future__ import annotations
 
 import random
 from dataclasses import dataclass
+from functools import cache
 
-from .constants import LETTERS, TRIANGLE_NUMBERS
+import numpy as np
+
+from .constants import CELL_CHARS, CHAR_CELLS, TRIANGLE_NUMBERS, Cell
+from .metrics import Metrics
 from .portal import Portal
+from .reachability import Reachability
+from .renderer import Renderer
 from .settings_data import SettingsData
+from .zobrist import MASK_64, cell_key_array, cell_keys, portal_keys
+
+CHAR_ARRAY = np.array(list(CELL_CHARS))
+# attempts the anchor search gets in all, shared between restarts that may each backtrack this often
+ANCHOR_ATTEMPTS = 2_000
+RESTART_BACKTRACKS = 100
+PACKING_ROUNDS = 8
+PACKING_BUDGET = 10_000
+#   #       #     #     #
+#   # # #   # #   #   # #
+#           #     #
+BARRIER_LAYOUTS = (((0, 0), (1, 0), (0, 1), (0, 2)),
+                   ((0, 0), (1, 0), (0, 1), (-1, 0)),
+                   ((0, 0), (1, 0), (-1, 0)),
+                   ((0, 0), (0, -1), (1, 0)))
+
 
+class BarrierSearchError(ValueError):
+    # the search ran out of budget before finding a placement or proving there is none
+    pass
 
-def place_dots(field: list[list[str]], dot_char: str,
-               dots_to_place: int) -> list[list[str]]:
+
+def place_dots(grid: np.ndarray, dot_cell: Cell, dots_to_place: int) -> np.ndarray:
     for i, num in enumerate(TRIANGLE_NUMBERS):
         if dots_to_place <= num:
             max_num_dots_in_row = i + 1
             break
-    for x, row in enumerate(field):
-        for y in range(0, max_num_dots_in_row):
-            if dots_to_place != 0:
-                row[y] = dot_char
-                dots_to_place -= 1
-        max_num_dots_in_row -= 1
-    return field
-
-
-def random_replace(field: list[list[str]], num_to_replace: int,
-                   new_char: str) -> tuple[list[list[str]], list[tuple[int, int]]]:
-    MAX_ITERATIONS = 100
-    num_iterations = 0
-    length = len(field)
-    width = len(field[0])
-    replaced_coords = []
-    while num_to_replace > 0 and num_iterations < MAX_ITERATIONS:
-        rand_index_1 = random.randint(0, length - 1)
-        rand_index_2 = random.randint(0, width - 1)
-        if field[rand_index_1][rand_index_2] == "/":
-            field[rand_index_1][rand_index_2] = new_char
-            replaced_coords.append((rand_index_1, rand_index_2))
-            num_to_replace -= 1
-        num_iterations += 1
-    return field, replaced_coords
-
-
-def can_place_barrier(field: list[list[str]], base_coord: tuple[int, int],
-                      barrier_shape: list[list[int]]) -> bool:
-    for dx, dy in barrier_shape:
-        x, y = base_coord[0] + dx, base_coord[1] + dy
-        if not (0 <= x < len(field) and 0 <= y < len(field[0])) or field[x][y] != "/":
-            return False
-    return True
-
-
-def place_barriers(field: list[list[str]],
-                   settings: SettingsData) -> tuple[list[list[str]], list[tuple[int, int]]]:
-    #   #       #     #     #
-    #   # # #   # #   #   # #
-    #           #     #
-    barrier_layouts = [[[0, 0], [1, 0], [0, 1], [0, 2]],
-                       [[0, 0], [1, 0], [0, 1], [-1, 0]],
-                       [[0, 0], [1, 0], [-1, 0]],
-                       [[0, 0], [0, -1], [1, 0]]]
+    rows, cols = np.indices(grid.shape)
+    triangle = np.flatnonzero(rows + cols < max_num_dots_in_row)[:dots_to_place]
+    grid.flat[triangle] = dot_cell
+    return grid
+
+
+def random_replace(grid: np.ndarray, num_to_replace: int, new_cell: Cell,
+                   rng: random.Random, metrics: Metrics | None = None) -> tuple[np.ndarray, list[tuple[int, int]]]:
+    free = np.flatnonzero(grid == Cell.REGULAR)
+    if metrics is not None:
+        # sampling from the free cells never retries, so the work is the candidates scanned and the cells drawn
+        metrics.count("random_replace_candidates", len(free))
+        metrics.count("random_replace_placed", min(num_to_replace, len(free)))
+    if num_to_replace > len(free):
+        raise ValueError(f"Cannot place {num_to_replace} {new_cell.name.lower()} cells, "
+                         f"only {len(free)} regular spaces are free")
+    chosen = rng.sample(free.tolist(), num_to_replace)
+    grid.flat[chosen] = new_cell
+    return grid, [divmod(index, grid.shape[1]) for index in chosen]
+
+
+def shift(mask: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    # shifted[x, y] == mask[x + dx, y + dy], False where that falls off the board
+    length, width = mask.shape
+    shifted = np.zeros_like(mask)
+    shifted[max(0, -dx):length - max(0, dx), max(0, -dy):width - max(0, dy)] = \
+        mask[max(0, dx):length + min(0, dx), max(0, dy):width + min(0, dy)]
+    return shifted
+
+
+def barrier_anchors(grid: np.ndarray) -> np.ndarray:
+    free = grid == Cell.REGULAR
+    anchors = np.empty((len(BARRIER_LAYOUTS), *grid.shape), dtype=bool)
+    for layout_index, layout in enumerate(BARRIER_LAYOUTS):
+        anchors[layout_index] = free
+        for dx, dy in layout:
+            anchors[layout_index] &= shift(free, dx, dy)
+    return anchors
+
+
+def block_anchors(anchors: np.ndarray, cells: list[tuple[int, int]]) -> None:
+    _, length, width = anchors.shape
+    for x, y in cells:
+        for layout_index, layout in enumerate(BARRIER_LAYOUTS):
+            for dx, dy in layout:
+                if 0 <= x - dx < length and 0 <= y - dy < width:
+                    anchors[layout_index, x - dx, y - dy] = False
+
+
+def fit_barriers(anchors: np.ndarray, barriers_to_place: int, rng: random.Random,
+                 budget: list[int]) -> list[list[tuple[int, int]]] | None:
+    if barriers_to_place == 0:
+        return []
+    # depth-first with an explicit stack, large boards need more barriers than the recursion limit allows;
+    # each frame holds the anchors left after the barriers placed so far and the candidates not yet tried
+    placed: list[list[tuple[int, int]]] = []
+    stack = [(anchors, np.flatnonzero(anchors).tolist())]
+    while stack:
+        anchors, candidates = stack[-1]
+        if not candidates or budget[0] <= 0:
+            stack.pop()
+            if placed:
+                placed.pop()
+            continue
+        budget[0] -= 1
+        pick = rng.randrange(len(candidates))
+        candidates[pick], candidates[-1] = candidates[-1], candidates[pick]
+        layout_index, x, y = np.unravel_index(candidates.pop(), anchors.shape)
+        cells = [(int(x) + dx, int(y) + dy) for dx, dy in BARRIER_LAYOUTS[layout_index]]
+        placed.append(cells)
+        if len(placed) == barriers_to_place:
+            return placed
+        remaining_anchors = anchors.copy()
+        block_anchors(remaining_anchors, cells)
+        stack.append((remaining_anchors, np.flatnonzero(remaining_anchors).tolist()))
+    return None
+
+
+def barrier_placements(grid: np.ndarray) -> tuple[list[int], list[list[tuple[int, ...]]]]:
+    # cells numbered along the shorter side, so no placement reaches more than two lines past its first cell,
+    # and every placement on free cells filed under its first cell in that order
+    length, width = grid.shape
+    cells = np.arange(length * width).reshape(length, width)
+    order = (cells.T if width > length else cells).ravel()
+    position = np.empty_like(order)
+    position[order] = np.arange(order.size)
+    starts: list[list[tuple[int, ...]]] = [[] for _ in range(order.size)]
+    for layout_index, x, y in np.argwhere(barrier_anchors(grid)).tolist():
+        placement = tuple(sorted(int(position[(x + dx) * width + y + dy]) for dx, dy in BARRIER_LAYOUTS[layout_index]))
+        starts[placement[0]].append(placement)
+    return order.tolist(), starts
+
+
+def pack_barriers(grid: np.ndarray, barriers_to_place: int, rng: random.Random | None,
+                  budget: list[int]) -> list[list[tuple[int, int]]] | None:
+    # an exhaustive search: each free cell in turn either starts a barrier or stays free. It stops when fewer free
+    # cells are left than the remaining barriers need, and remembers the frontiers it has already failed from.
+    # None means the barriers cannot fit, unless the budget ran out first. Without rng the order is fixed.
+    order, starts = barrier_placements(grid)
+    free = (grid == Cell.REGULAR).ravel()
+    open_cells = [bool(free[cell]) for cell in order]
+    remaining = sum(open_cells)
+    span = 2 * min(grid.shape) + 2
+    failed: dict[tuple, int] = {}
+    placed: list[tuple[int, ...]] = []
+    stack: list[list] = []
+    cell = 0
+    while len(placed) < barriers_to_place:
+        while cell < len(open_cells) and not open_cells[cell]:
+            cell += 1
+        key = (cell, tuple(open_cells[cell:cell + span]))
+        if (cell < len(open_cells) and remaining >= 3 * (barriers_to_place - len(placed))
+                and failed.get(key, -1) < len(placed)):
+            options = [placement for placement in starts[cell] if all(open_cells[index] for index in placement)]
+            if rng is not None:
+                rng.shuffle(options)
+            options.append((cell,))
+            stack.append([cell, options, -1, key, len(placed)])
+        # take back the last choice and make the next one, dropping frames that have run out of choices
+        while stack:
+            frame = stack[-1]
+            at, options, chosen, key, placed_before = frame
+            if chosen >= 0:
+                for index in options[chosen]:
+                    open_cells[index] = True
+                remaining += len(options[chosen])
+                if len(options[chosen]) > 1:
+                    placed.pop()
+            if chosen + 1 == len(options) or budget[0] <= 0:
+                stack.pop()
+                if budget[0] > 0:
+                    failed[key] = max(failed.get(key, -1), placed_before)
+                continue
+            budget[0] -= 1
+            frame[2] = chosen = chosen + 1
+            for index in options[chosen]:
+                open_cells[index] = False
+            remaining -= len(options[chosen])
+            if len(options[chosen]) > 1:
+                placed.append(options[chosen])
+            cell = at + 1
+            break
+        else:
+            return None
+    width = grid.shape[1]
+    return [[divmod(order[index], width) for index in placement] for placement in placed]
+@cache
+def barriers_fit(length: int, width: int, num_dots: int, barrier_density: int) -> bool:
+    # barriers always go onto the same starting grid, so whether they fit depends on the settings alone.
+    # Shuffled searches find packings quickly where a fixed order can stall, the fixed order proves there are none
+    grid = starting_grid(SettingsData(length=length, width=width, num_dots=num_dots, barrier_density=barrier_density))
+    barriers_to_place = (length // barrier_density) * (width // barrier_density)
+    for round in range(PACKING_ROUNDS):
+        for rng in (random.Random(round), None):
+            budget = [PACKING_BUDGET << round]
+            if pack_barriers(grid, barriers_to_place, rng, budget) is not None:
+                return True
+            if budget[0] > 0:
+                return False
+    raise BarrierSearchError(f"Gave up deciding whether {barriers_to_place} barriers fit on a {length}x{width} board")
+
+
+def place_barriers(grid: np.ndarray, settings: SettingsData, rng: random.Random,
+                   metrics: Metrics | None = None) -> tuple[np.ndarray, list[tuple[int, int]]]:
     barriers_to_place = (settings.length // settings.barrier_density) * (settings.width // settings.barrier_density)
-    MAX_ITERATIONS = 1000
-    num_iterations = 0
-    barrier_coords = []
-    while barriers_to_place > 0 and num_iterations < MAX_ITERATIONS:
-        rand_coord = (random.randint(0, settings.length - 1), random.randint(0, settings.width - 1))
-        rand_barrier = random.choice(barrier_layouts)
-        if can_place_barrier(field, rand_coord, rand_barrier):
-            for dx, dy in rand_barrier:
-                field[rand_coord[0] + dx][rand_coord[1] + dy] = "#"
-                barrier_coords.append((rand_coord[0] + dx, rand_coord[1] + dy))
-            barriers_to_place -= 1
-        num_iterations += 1
-    return field, barrier_coords
+    if not barriers_fit(settings.length, settings.width, settings.num_dots, settings.barrier_density):
+        raise ValueError(f"Cannot fit {barriers_to_place} barriers on a {settings.length}x{settings.width} board")
+    # the anchor search spreads barriers evenly but can wander into dead ends, so it restarts with a fresh order;
+    # tight boards fall back to the exhaustive search, shuffled by the game's generator
+    iterations = 0
+    anchors = barrier_anchors(grid)
+    for _ in range(max(1, ANCHOR_ATTEMPTS // (barriers_to_place + RESTART_BACKTRACKS))):
+        budget = [barriers_to_place + RESTART_BACKTRACKS]
+        barriers = fit_barriers(anchors, barriers_to_place, rng, budget)
+        iterations += barriers_to_place + RESTART_BACKTRACKS - budget[0]
+        if barriers is not None:
+            break
+    else:
+        for round in range(PACKING_ROUNDS):
+            budget = [PACKING_BUDGET << round]
+            barriers = pack_barriers(grid, barriers_to_place, rng, budget)
+            iterations += (PACKING_BUDGET << round) - budget[0]
+            if barriers is not None:
+                break
+    if metrics is not None:
+        metrics.count("place_barriers_iterations", iterations)
+        metrics.count("place_barriers_backtracks", iterations - len(barriers or ()))
+    if barriers is None:
+        raise BarrierSearchError(f"Gave up placing {barriers_to_place} barriers on a "
+                                 f"{settings.length}x{settings.width} board")
+    barrier_coords = [cell for barrier in barriers for cell in barrier]
+    for coord in barrier_coords:
+        grid[coord] = Cell.BARRIER
+    return grid, barrier_coords
+
+
+def starting_grid(settings: SettingsData) -> np.ndarray:
+    grid = np.full((settings.length, settings.width), Cell.REGULAR, dtype=np.uint8)
+    grid = place_dots(grid, Cell.X, settings.num_dots)
+    grid = np.ascontiguousarray(grid[::-1, ::-1])
+    return place_dots(grid, Cell.O, settings.num_dots)
+
+
+def generate_boards(settings: SettingsData, count: int, rng: random.Random | None = None) -> list[Board]:
+    rng = rng or random.Random()
+    template = starting_grid(settings)
+    return [Board.from_settings(settings, rng, template) for _ in range(count)]
 
 
 @dataclass
 class Board:
-    field: list[list[str]]
-    crumblies: list[tuple[int, int]]
-    powerups: list[tuple[int, int]]
-    barriers: list[tuple[int, int]]
-    portals: list[tuple[Portal, Portal]]
+    grid: np.ndarray
+    crumblies: set[tuple[int, int]]
+    powerups: set[tuple[int, int]]
+    barriers: set[tuple[int, int]]
+    portals: list[Portal]
 
     def __post_init__(self) -> None:
-        self.length = len(self.field)
-        self.width = len(self.field[0])
-        self.dot_coords = {1: self.scan_char_coords("O"), 2: self.scan_char_coords("X")}
+        self.length, self.width = self.grid.shape
+        # insertion-ordered sets of each player's pieces
+        self.dot_coords = {1: dict.fromkeys(self.scan_char_coords("O")), 2: dict.fromkeys(self.scan_char_coords("X"))}
+        self.portal_at = {coord: portal for portal in self.portals for coord in (portal.coord_1, portal.coord_2)}
+        self.cell_keys = cell_keys(self.length, self.width)
+        self.portal_keys = portal_keys(self.length, self.width)
+        keys = np.take_along_axis(cell_key_array(self.length, self.width), self.grid[..., None], axis=2)
+        self.hash = int(np.bitwise_xor.reduce(keys, axis=None))
+        for portal in self.portals:
+            self.hash ^= self.portal_key(portal)
+        # built on first use and then kept in step with every terrain change
+        self.maps: Reachability | None = None
+
+    def reachability(self) -> Reachability:
+        if self.maps is None:
+            self.maps = Reachability(self)
+        return self.maps
+
+    @property
+    def field(self) -> tuple[tuple[str, ...], ...]:
+        # rendered from the grid on every read, so it is read-only; changes go through replace_char
+        return tuple(map(tuple, CHAR_ARRAY[self.grid].tolist()))
 
     def scan_char_coords(self, target_char: str) -> list[tuple[int, int]]:
-        return [(x, y) for x, row in enumerate(self.field)
-                for y, char in enumerate(row) if char == target_char]
+        return [(x, y) for x, y in np.argwhere(self.grid == CHAR_CELLS[target_char]).tolist()]
+
+    def contains_char(self, target_char: str) -> bool:
+        return bool((self.grid == CHAR_CELLS[target_char]).any())
 
     @staticmethod
-    def from_settings(settings: SettingsData) -> Board:
-        field = [["/" for _ in range(settings.width)] for _ in range(settings.length)]
-        field = place_dots(field, "X", settings.num_dots)
-        field = [row[::-1] for row in field][::-1]
-        field = place_dots(field, "O", settings.num_dots)
-        field, powerup_coords = random_replace(field, settings.num_powerups, "?")
-        field, barrier_coords = place_barriers(field, settings)
-        field, crumblies_coords = random_replace(field, settings.num_crumblies, "~")
-        return Board(field, crumblies_coords, powerup_coords, barrier_coords, [])
-
-    def place_powerup(self) -> None:
-        self.field, powerup_coords = random_replace(self.field, 1, "?")
-        self.powerups.append(powerup_coords[0])
+    def from_settings(settings: SettingsData, rng: random.Random | None = None,
+                      template: np.ndarray | None = None, metrics: Metrics | None = None) -> Board:
+        rng = rng or random.Random()
+        grid = starting_grid(settings) if template is None else template.copy()
+        grid, barrier_coords = place_barriers(grid, settings, rng, metrics)
+        grid, powerup_coords = random_replace(grid, settings.num_powerups, Cell.POWERUP, rng, metrics)
+        grid, crumblies_coords = random_replace(grid, settings.num_crumblies, Cell.CRUMBLY, rng, metrics)
+        return Board(grid, set(crumblies_coords), set(powerup_coords), set(barrier_coords), [])
+
+    def place_powerup(self, rng: random.Random) -> tuple[int, int] | None:
+        free = np.flatnonzero(self.grid == Cell.REGULAR).tolist()
+        if not free:
+            return None
+        coord = divmod(rng.choice(free), self.width)
+        self.replace_char(coord, "?")
+        self.powerups.add(coord)
+        return coord
 
     def get_char(self, coord: tuple[int, int]) -> str:
-        return self.field[coord[0]][coord[1]]
+        return CELL_CHARS[self.grid[coord]]
 
     def replace_char(self, coord: tuple[int, int], new_char: str) -> None:
-        self.field[coord[0]][coord[1]] = new_char
+        keys = self.cell_keys[coord[0]][coord[1]]
+        old_cell, new_cell = self.grid[coord], CHAR_CELLS[new_char]
+        self.hash ^= keys[old_cell] ^ keys[new_cell]
+        self.grid[coord] = new_cell
+        if self.maps is not None:
+            self.maps.cell_changed(coord, old_cell, new_cell)
+
+    def add_piece(self, player: int, coord: tuple[int, int], index: int | None = None) -> None:
+        pieces = self.dot_coords[player]
+        if index is None or index == len(pieces):
+            pieces[coord] = None
+            return
+        # putting a piece back where it was, so that undoing a move restores the move order too
+        order = list(pieces)
+        order.insert(index, coord)
+        pieces.clear()
+        pieces.update(dict.fromkeys(order))
+
+    def remove_piece(self, player: int, coord: tuple[int, int]) -> int:
+        pieces = self.dot_coords[player]
+        index = len(pieces) - 1 if next(reversed(pieces)) == coord else list(pieces).index(coord)
+        del pieces[coord]
+        return index
+
+    def piece_count(self, player: int) -> int:
+        return len(self.dot_coords[player])
+
+    def portal_key(self, portal: Portal) -> int:
+        (x_1, y_1), (x_2, y_2) = portal.coord_1, portal.coord_2
+        return (self.portal_keys[x_1][y_1] * self.portal_keys[x_2][y_2]) & MASK_64
+
+    def add_portal(self, portal: Portal, index: int | None = None) -> None:
+        self.portals.insert(len(self.portals) if index is None else index, portal)
+        self.portal_at[portal.coord_1] = self.portal_at[portal.coord_2] = portal
+        self.hash ^= self.portal_key(portal)
+
+    def remove_portal(self, portal: Portal) -> int:
+        index = self.portals.index(portal)
+        del self.portals[index]
+        del self.portal_at[portal.coord_1], self.portal_at[portal.coord_2]
+        self.hash ^= self.portal_key(portal)
+        return index
 
     def is_within_bounds(self, coord: tuple[int, int]) -> bool:
         return 0 <= coord[0] < self.length and 0 <= coord[1] < self.width
 
     def show(self) -> None:
-        print("\n")
-        for i, row in enumerate(self.field):
-            print(f"{LETTERS[i]}\t{'\t'.join(row)}")
-        line = "\t"
-        for i in range(1, self.width + 1):
-            if self.width > 9 and i < 10:
-                line += "0"
-            line += str(i) + "\t"
-        print("\n" + line)
+        Renderer(ansi=False).draw(self)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+from .constants import DOUBLE_JUMP_VECTORS, MOVE_VECTORS
+from .engine import Action, ActionKind, apply, move_actions, undo
+from .tablebase import best_action
+from .zobrist import TranspositionTable
+
+if TYPE_CHECKING:
+    from .game import Game
+
+MATE = 1_000_000
+# worth less than the piece itself, the side to move may have better things to do than take it
+HANGING_PIECE = 40
+EXACT, LOWER, UPPER = 0, 1, 2
+TIME_CHECK_INTERVAL = 512
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class SearchResult:
+    action: Action
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        if not self.nodes:
+            return "tablebase"
+        return f"depth {self.depth}, {self.nodes_per_second:,.0f} nodes/s"
+
+
+def evaluate(game: Game, player: int) -> int:
+    opponent = 3 - player
+    board = game.board
+    # the side to move can take one of the pieces an enemy move lands on, which the search may not look far enough for
+    hanging = HANGING_PIECE if board.reachability().threatened[3 - game.turn] else 0
+    return (100 * (board.piece_count(player) - board.piece_count(opponent))
+            + 15 * (len(game.inventory[player]) - len(game.inventory[opponent]))
+            + 2 * (game.deletes[player] + game.creates[player] - game.deletes[opponent] - game.creates[opponent])
+            + (hanging if game.turn == player else -hanging))
+
+
+def neighbours(coords: Iterable[tuple[int, int]]) -> set[tuple[int, int]]:
+    return {(x + dx, y + dy) for x, y in coords for dx, dy in MOVE_VECTORS}
+
+
+def search_actions(game: Game) -> list[Action]:
+    # every move, but only placements next to a piece, to keep the branching factor searchable
+    board = game.board
+    actions = move_actions(game, ActionKind.MOVE, MOVE_VECTORS)
+    inventory = game.inventory[game.turn]
+    if ActionKind.DOUBLE_JUMP.value in inventory:
+        actions += move_actions(game, ActionKind.DOUBLE_JUMP, DOUBLE_JUMP_VECTORS)
+    own = [coord for coord in neighbours(board.dot_coords[game.turn]) if board.is_within_bounds(coord)]
+    enemy = [coord for coord in neighbours(board.dot_coords[3 - game.turn]) if board.is_within_bounds(coord)]
+    if ActionKind.PORTAL.value in inventory:
+        actions += [Action(ActionKind.PORTAL, (entrance, exit_))
+                    for entrance in own if board.get_char(entrance) == "/"
+                    for exit_ in enemy if exit_ != entrance and board.get_char(exit_) == "/"]
+    if ActionKind.DESTROYER.value in inventory:
+        actions += [Action(ActionKind.DESTROYER, (coord,)) for coord in own if board.get_char(coord) == "#"]
+    near = set(own) | set(enemy)
+    if game.deletes[game.turn] > 0:
+        actions += [Action(ActionKind.DELETE, (coord,)) for coord in near if board.get_char(coord) == "/"]
+    if game.creates[game.turn] > 0:
+        actions += [Action(ActionKind.CREATE, (coord,)) for coord in near if board.get_char(coord) == " "]
+    return actions
+
+
+def order_actions(game: Game, actions: list[Action], best: Action | None) -> list[Action]:
+    def priority(action: Action) -> int:
+        if action == best:
+            return 0
+        if action.kind in (ActionKind.MOVE, ActionKind.DOUBLE_JUMP):
+            destination_char = game.board.get_char(action.destination)
+            if destination_char == game.target_char:
+                return 1
+            if destination_char == "?":
+                return 2
+            return 3
+        return 4
+    return sorted(actions, key=priority)
+
+
+@dataclass
+class AlphaBetaBot:
+    time_budget: float = 1.0
+    max_depth: int = 64
+    table: TranspositionTable = field(default_factory=lambda: TranspositionTable(1 << 18))
+
+    def __post_init__(self) -> None:
+        self.nodes = 0
+        self.deadline = 0.0
+        self.last_result: SearchResult | None = None
+
+    def choose(self, game: Game) -> Action:
+        start = time.perf_counter()
+        self.deadline = start + self.time_budget
+        self.nodes = 0
+        solved = best_action(game)
+        if solved is not None:
+            # only tables already on disk are probed, building one is far too slow for a move
+            action, value = solved
+            score = MATE - value if value > 0 else -MATE - value if value < 0 else 0
+            self.last_result = SearchResult(action, score, 0, 0, time.perf_counter() - start)
+            return action
+        actions = order_actions(game, search_actions(game), None) or [Action(ActionKind.CONCEDE)]
+        best, best_score, depth_reached = actions[0], -MATE, 0
+        rng_state = game.rng.getstate()
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, action = self.search_root(game, actions, depth)
+            except SearchTimeout:
+                break
+            finally:
+                game.rng.setstate(rng_state)
+            best, best_score, depth_reached = action, score, depth
+            actions = [best] + [other for other in actions if other != best]
+            if abs(score) >= MATE - self.max_depth:
+                break
+        self.last_result = SearchResult(best, best_score, depth_reached, self.nodes, time.perf_counter() - start)
+        return best
+
+    def search_root(self, game: Game, actions: list[Action], depth: int) -> tuple[int, Action]:
+        player = game.turn
+        alpha, best = -MATE - 1, actions[0]
+        for action in actions:
+            record = apply(game, action)
+            try:
+                score = -self.negamax(game, depth - 1, -MATE - 1, -alpha, 3 - player, 1)
+            finally:
+                undo(game, record)
+            if score > alpha:
+                alpha, best = score, action
+        return alpha, best
+
+    def negamax(self, game: Game, depth: int, alpha: int, beta: int, player: int, ply: int) -> int:
+        self.nodes += 1
+        if not self.nodes % TIME_CHECK_INTERVAL and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if game.winner is not None:
+            return MATE - ply if game.winner == player else ply - MATE
+        if game.position_counts[game.hash] > 1:
+            return 0
+        if depth == 0:
+            return evaluate(game, player)
+        key = game.hash
+        entry = self.table.probe(key)
+        best_action = None
+        if entry is not None:
+            entry_depth, entry_score, flag, best_action = entry
+            if entry_depth >= depth and (flag == EXACT
+                                         or (flag == LOWER and entry_score >= beta)
+                                         or (flag == UPPER and entry_score <= alpha)):
+                return entry_score
+        actions = search_actions(game)
+        if not actions:
+            return evaluate(game, player)
+        original_alpha, best_score = alpha, -MATE - 1
+        for action in order_actions(game, actions, best_action):
+            record = apply(game, action)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, 3 - player, ply + 1)
+            finally:
+                undo(game, record)
+            if score > best_score:
+                best_score, best_action = score, action
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        flag = UPPER if best_score <= original_alpha else LOWER if best_score >= beta else EXACT
+        self.table.store(key, (depth, best_score, flag, best_action))
+        return best_score
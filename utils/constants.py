@@ -1,7 +1,29 @@
+from enum import IntEnum
 from pathlib import Path
 
 LETTERS = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M", "N", "O"]
 TRIANGLE_NUMBERS = [1, 3, 6, 10, 15, 21, 28, 36, 45, 55, 66, 78, 91, 105]
 BARRIER_DENSITY_TRANS = {2: "Insanely Thick", 3: "Thick", 4: "Normal", 5: "Sparse"}
 SCORES_PATH = Path(__file__).parents[1].joinpath("scores.csv")
+SCORES_DB_PATH = Path(__file__).parents[1].joinpath("scores.db")
+RECORDS_PATH = Path(__file__).parents[1].joinpath("records")
+BENCHMARK_BASELINE_PATH = Path(__file__).parents[1].joinpath("benchmark_baseline.json")
+TABLEBASE_PATH = Path(__file__).parents[1].joinpath("tablebases")
 POWERUPS = ("Portal", "Double-Jump", "Destroyer")
+
+
+class Cell(IntEnum):
+    REGULAR = 0
+    BARRIER = 1
+    CRUMBLY = 2
+    POWERUP = 3
+    PORTAL = 4
+    BLANK = 5
+    O = 6
+    X = 7
+
+
+CELL_CHARS = "/#~?@ OX"
+CHAR_CELLS = {char: Cell(i) for i, char in enumerate(CELL_CHARS)}
+MOVE_VECTORS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+DOUBLE_JUMP_VECTORS = ((0, 2), (0, -2), (2, 0), (-2, 0))
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import random
+import shutil
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from .constants import POWERUPS, Cell
+from .engine import apply
+from .game import Game
+from .policies import POLICIES
+from .settings_data import SettingsData
+from .simulation import game_seed
+
+DATASET_VERSION = 1
+SHARD_SIZE = 1 << 16
+# games handed to the workers at once, so finished games never pile up faster than shards are written
+GAMES_PER_ROUND = 64
+CELLS = np.arange(len(Cell), dtype=np.uint8)[:, None, None]
+
+
+def record_arrays(length: int, width: int, size: int) -> dict[str, np.ndarray]:
+    # one record per position: a plane per Cell, the character Board.field shows, then the side to move's situation
+    return {"planes": np.zeros((size, len(Cell), length, width), dtype=np.uint8),
+            "side": np.zeros(size, dtype=np.int8),
+            "turn": np.zeros(size, dtype=np.int32),
+            "inventory": np.zeros((size, 2, len(POWERUPS)), dtype=np.int16),
+            "deletes": np.zeros((size, 2), dtype=np.int16),
+            "creates": np.zeros((size, 2), dtype=np.int16),
+            "outcome": np.zeros(size, dtype=np.int8),
+            "game": np.zeros(size, dtype=np.int32)}
+
+
+def play_positions(arguments: tuple[SettingsData, tuple[str, str], int, int, int]) -> dict[str, np.ndarray] | None:
+    # every position a side moved from in one game, or None if its board could not be generated
+    settings, policy_names, seed, index, max_turns = arguments
+    try:
+        game = Game(settings, seed=game_seed(seed, index))
+    except ValueError:
+        return None
+    policies = {player: POLICIES[name](random.Random(game_seed(seed, index, "policy", str(player))))
+                for player, name in zip((1, 2), policy_names)}
+    planes, sides, turns, inventories, deletes, creates = [], [], [], [], [], []
+    while game.winner is None and game.turn_number <= max_turns:
+        planes.append(game.board.grid == CELLS)
+        sides.append(game.turn)
+        turns.append(game.turn_number)
+        inventories.append([[game.inventory[player].count(powerup) for powerup in POWERUPS] for player in (1, 2)])
+        deletes.append((game.deletes[1], game.deletes[2]))
+        creates.append((game.creates[1], game.creates[2]))
+        apply(game, policies[game.turn](game))
+    arrays = record_arrays(settings.length, settings.width, len(sides))
+    if sides:
+        arrays["planes"][:] = planes
+        arrays["side"][:], arrays["turn"][:], arrays["inventory"][:] = sides, turns, inventories
+        arrays["deletes"][:], arrays["creates"][:] = deletes, creates
+    # from the side to move's point of view, 0 for games that ran out of turns
+    if game.winner is not None:
+        arrays["outcome"][:] = np.where(arrays["side"] == game.winner, 1, -1)
+    arrays["game"][:] = index
+    return arrays
+
+
+RECORD_FIELDS = tuple(record_arrays(1, 1, 0))
+
+
+@dataclass
+class Shard:
+    name: str
+    positions: int
+    games: tuple[int, int]
+
+
+@dataclass
+class Dataset:
+    # a directory of shards, each a directory of .npy files np.load can map without reading, and index.json,
+    # which only lists shards that were completely written
+    path: Path
+    settings: dict = field(default_factory=dict)
+    policies: tuple[str, str] = ("random", "random")
+    seed: int = 0
+    max_turns: int = 500
+    games: int = 0
+    generation_failures: int = 0
+    shards: list[Shard] = field(default_factory=list)
+
+    @property
+    def index_path(self) -> Path:
+        return self.path / "index.json"
+
+    @staticmethod
+    def open(path: Path) -> Dataset:
+        index = json.loads((path / "index.json").read_text())
+        if index.pop("version") != DATASET_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version")
+        index["policies"] = tuple(index["policies"])
+        index["shards"] = [Shard(shard["name"], shard["positions"], tuple(shard["games"])) for shard in index["shards"]]
+        return Dataset(path, **index)
+
+    def __len__(self) -> int:
+        return sum(shard.positions for shard in self.shards)
+
+    def __iter__(self) -> Iterator[dict[str, np.ndarray]]:
+        return (self.load(shard) for shard in range(len(self.shards)))
+
+    def load(self, shard: int) -> dict[str, np.ndarray]:
+        directory = self.path / self.shards[shard].name
+        return {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in RECORD_FIELDS}
+
+    def save_index(self) -> None:
+        # written beside the index and swapped in, so an interruption leaves the previous index whole
+        index = {"version": DATASET_VERSION} | {key: value for key, value in asdict(self).items() if key != "path"}
+        temporary = self.path / "index.json.tmp"
+        with temporary.open("w") as file:
+            file.write(json.dumps(index, indent=2))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.index_path)
+
+    def write_shard(self, arrays: dict[str, np.ndarray], positions: int, games: tuple[int, int]) -> None:
+        name = f"shard-{len(self.shards):05d}"
+        temporary = self.path / f"{name}.tmp"
+        # left by a run interrupted before its index was updated
+        for stale in (temporary, self.path / name):
+            if stale.exists():
+                shutil.rmtree(stale)
+        temporary.mkdir()
+        for key, values in arrays.items():
+            with (temporary / f"{key}.npy").open("wb") as file:
+                np.save(file, values[:positions])
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporary, self.path / name)
+        self.shards.append(Shard(name, positions, games))
+        self.save_index()
+
+
+def export_dataset(output: Path, settings: SettingsData, policy_names: tuple[str, str], num_games: int,
+                   seed: int = 0, workers: int = 1, max_turns: int = 500, shard_size: int = SHARD_SIZE) -> Dataset:
+    # streams the positions of num_games self-play games into shards of at most shard_size positions; whole games
+    # go into one shard, so a rerun with the same options carries on after the last shard that was written
+    if shard_size <= max_turns:
+        raise ValueError("A shard must hold at least one game of max_turns turns")
+    output.mkdir(parents=True, exist_ok=True)
+    if (output / "index.json").exists():
+        dataset = Dataset.open(output)
+        if (dataset.settings, dataset.policies, dataset.seed, dataset.max_turns) != \
+                (asdict(settings), policy_names, seed, max_turns):
+            raise ValueError(f"{output} holds a dataset exported with other options")
+    else:
+        dataset = Dataset(output, asdict(settings), policy_names, seed, max_turns)
+    buffer = record_arrays(settings.length, settings.width, shard_size)
+    positions, first = 0, dataset.games
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        for start in range(dataset.games, num_games, GAMES_PER_ROUND):
+            tasks = [(settings, policy_names, seed, index, max_turns)
+                     for index in range(start, min(start + GAMES_PER_ROUND, num_games))]
+            for index, arrays in enumerate(map(play_positions, tasks) if pool is None else
+                                           pool.imap(play_positions, tasks), start):
+                if arrays is None:
+                    dataset.generation_failures += 1
+                    continue
+                count = len(arrays["side"])
+                if positions + count > shard_size:
+                    dataset.games = index
+                    dataset.write_shard(buffer, positions, (first, index))
+                    positions, first = 0, index
+                for key, values in arrays.items():
+                    buffer[key][positions:positions + count] = values
+                positions += count
+        if positions or first < num_games:
+            dataset.games = num_games
+            dataset.write_shard(buffer, positions, (first, dataset.games))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return dataset
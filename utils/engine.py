@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from itertools import combinations
+from typing import TYPE_CHECKING, Any, Callable
+
+from .constants import DOUBLE_JUMP_VECTORS, MOVE_VECTORS
+from .other_utils import coord_to_string, string_to_coord
+from .portal import Portal
+
+if TYPE_CHECKING:
+    from .game import Game
+
+
+class ActionKind(Enum):
+    MOVE = "Move"
+    DOUBLE_JUMP = "Double-Jump"
+    PORTAL = "Portal"
+    DESTROYER = "Destroyer"
+    DELETE = "Delete"
+    CREATE = "Create"
+    CONCEDE = "Concede"
+
+
+POWERUP_ACTIONS = {ActionKind.DOUBLE_JUMP, ActionKind.PORTAL, ActionKind.DESTROYER}
+COORD_COUNTS = {ActionKind.MOVE: 2, ActionKind.DOUBLE_JUMP: 2, ActionKind.PORTAL: 2, ActionKind.DESTROYER: 1,
+                ActionKind.DELETE: 1, ActionKind.CREATE: 1, ActionKind.CONCEDE: 0}
+ACTION_NAMES = {kind.value.lower(): kind for kind in ActionKind}
+
+
+@dataclass(frozen=True)
+class Action:
+    kind: ActionKind
+    coords: tuple[tuple[int, int], ...] = ()
+
+    @property
+    def origin(self) -> tuple[int, int]:
+        return self.coords[0]
+
+    @property
+    def destination(self) -> tuple[int, int]:
+        return self.coords[-1]
+
+    def __str__(self) -> str:
+        return " ".join([self.kind.value] + [coord_to_string(coord) for coord in self.coords])
+
+
+@dataclass
+class Undo:
+    action: Action
+    turn: int
+    turn_number: int
+    winner: int | None
+    state_hash: int
+    changes: list[tuple[Callable[..., Any], tuple]] = field(default_factory=list)
+
+
+def parse_action(text: str) -> Action:
+    # the inverse of str(action), e.g. "Move 1A 2A" or "concede"
+    name, *coords = text.split() or [""]
+    kind = ACTION_NAMES.get(name.lower())
+    if kind is None:
+        raise ValueError(f"Unknown action '{name}'")
+    if len(coords) != COORD_COUNTS[kind]:
+        raise ValueError(f"{kind.value} takes {COORD_COUNTS[kind]} coordinates")
+    for coord in coords:
+        if not re.match(r"^\d+[A-Za-z]+$", coord):
+            raise ValueError(f"Invalid coordinate '{coord}'")
+    return Action(kind, tuple(string_to_coord(coord) for coord in coords))
+
+
+def move_actions(game: Game, kind: ActionKind, vectors: tuple[tuple[int, int], ...]) -> list[Action]:
+    maps = game.board.maps
+    if kind is ActionKind.MOVE and maps is not None:
+        # once a search has built them, one lookup per direction instead of a slide
+        return [Action(kind, move) for move in maps.moves(game.turn)]
+    return [Action(kind, (origin, destination))
+            for origin in game.board.dot_coords[game.turn]
+            for destination in game.detect_moves(origin, vectors).values()]
+
+
+def legal_actions(game: Game, portal_pairs: bool = True) -> list[Action]:
+    # without portal_pairs a held portal is left out, its pairs grow with the square of the board's area
+    if game.winner is not None:
+        return []
+    actions = move_actions(game, ActionKind.MOVE, MOVE_VECTORS)
+    inventory = game.inventory[game.turn]
+    if ActionKind.DOUBLE_JUMP.value in inventory:
+        actions += move_actions(game, ActionKind.DOUBLE_JUMP, DOUBLE_JUMP_VECTORS)
+    if portal_pairs and ActionKind.PORTAL.value in inventory:
+        actions += [Action(ActionKind.PORTAL, pair) for pair in combinations(game.board.scan_char_coords("/"), 2)]
+    if ActionKind.DESTROYER.value in inventory:
+        actions += [Action(ActionKind.DESTROYER, (coord,)) for coord in game.board.scan_char_coords("#")]
+    if game.deletes[game.turn] > 0:
+        actions += [Action(ActionKind.DELETE, (coord,)) for coord in game.board.scan_char_coords("/")]
+    if game.creates[game.turn] > 0:
+        actions += [Action(ActionKind.CREATE, (coord,)) for coord in game.board.scan_char_coords(" ")]
+    actions.append(Action(ActionKind.CONCEDE))
+    return actions
+
+
+def is_legal(game: Game, action: Action) -> bool:
+    board, inventory = game.board, game.inventory[game.turn]
+    if game.winner is not None or any(not board.is_within_bounds(coord) for coord in action.coords):
+        return False
+    if action.kind in POWERUP_ACTIONS and action.kind.value not in inventory:
+        return False
+    if action.kind in (ActionKind.MOVE, ActionKind.DOUBLE_JUMP):
+        vectors = DOUBLE_JUMP_VECTORS if action.kind is ActionKind.DOUBLE_JUMP else MOVE_VECTORS
+        return (action.origin in board.dot_coords[game.turn]
+                and action.destination in game.detect_moves(action.origin, vectors).values())
+    if action.kind is ActionKind.PORTAL:
+        return action.coords[0] != action.coords[1] and all(board.get_char(coord) == "/" for coord in action.coords)
+    if action.kind is ActionKind.DESTROYER:
+        return board.get_char(action.origin) == "#"
+    if action.kind is ActionKind.DELETE:
+        return game.deletes[game.turn] > 0 and board.get_char(action.origin) == "/"
+    if action.kind is ActionKind.CREATE:
+        return game.creates[game.turn] > 0 and board.get_char(action.origin) == " "
+    return True
+
+
+def apply(game: Game, action: Action) -> Undo:
+    record = Undo(action, game.turn, game.turn_number, game.winner, game.state_hash)
+    game.journal = record.changes
+    if action.kind in POWERUP_ACTIONS:
+        game.spend_powerup(action.kind.value)
+    if action.kind in (ActionKind.MOVE, ActionKind.DOUBLE_JUMP):
+        game.process_move(action.origin, action.destination)
+    elif action.kind is ActionKind.PORTAL:
+        for coord in action.coords:
+            game.set_char(coord, "@")
+        portal = Portal(*action.coords)
+        game.board.add_portal(portal)
+        game.record(game.board.remove_portal, portal)
+    elif action.kind is ActionKind.DESTROYER:
+        game.set_char(action.origin, "/")
+        game.remove_member(game.board.barriers, action.origin)
+    elif action.kind is ActionKind.DELETE:
+        game.set_char(action.origin, " ")
+        game.spend_count("deletes")
+    elif action.kind is ActionKind.CREATE:
+        game.set_char(action.origin, "/")
+        game.spend_count("creates")
+    elif action.kind is ActionKind.CONCEDE:
+        game.winner = 3 - game.turn
+    if game.winner is None:
+        if game.check_defeat():
+            game.winner = game.turn
+        else:
+            game.end_turn()
+    game.journal = None
+    game.position_counts[game.hash] += 1
+    return record
+
+
+def undo(game: Game, record: Undo) -> None:
+    position = game.hash
+    game.position_counts[position] -= 1
+    if not game.position_counts[position]:
+        del game.position_counts[position]
+    for function, args in reversed(record.changes):
+        function(*args)
+    game.turn, game.turn_number = record.turn, record.turn_number
+    game.winner, game.state_hash = record.winner, record.state_hash
@@ -1,36 +1,173 @@
+import copy
 import random
+import time
+from collections import Counter
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
 
 from .board import Board
-from .constants import POWERUPS, SCORES_PATH
-from .other_utils import export_2d, import_2d, coord_to_string
-from .portal import Portal
+from .bot import AlphaBetaBot
+from .constants import DOUBLE_JUMP_VECTORS, MOVE_VECTORS, POWERUPS, RECORDS_PATH, Cell
+from .engine import POWERUP_ACTIONS, Action, ActionKind, apply
+from .metrics import Metrics, timer
+from .other_utils import coord_to_string
+from .record import GameWriter
+from .renderer import Renderer
+from .scores import ScoreStore
 from .settings_data import SettingsData
+from .snapshot import History, Snapshot
+from .tablebase import TABLEBASE_MAX_SIZE, best_action
 from .validation_utils import (confirm, get_valid_coord, get_valid_int,
                                get_valid_str)
+from .zobrist import SIDE_KEY, counter_key
+
+if TYPE_CHECKING:
+    from .mcts import MCTSBot
 
 DOT_CHARS = {1: "O", 2: "X"}
+# hot methods that an instrumented game wraps on the instance, so an uninstrumented game runs them untouched
+TIMED_PHASES = {"detect_moves": "move_calculation", "process_move": "process_move",
+                "check_defeat": "defeat_check", "start_turn": "powerup_spawn"}
 
 
 @dataclass
 class Game:
     settings: SettingsData
     inventory: dict[int, list[str]] = field(default_factory=lambda: {1: [], 2: []})
+    bots: dict[int, "AlphaBetaBot | MCTSBot"] = field(default_factory=dict)
+    seed: int | None = None
+    metrics: Metrics | None = None
 
     def __post_init__(self) -> None:
-        self.board = Board.from_settings(self.settings)
+        if self.seed is None:
+            self.seed = random.SystemRandom().getrandbits(64)
+        self.rng = random.Random(self.seed)
+        with timer(self.metrics, "board_generation"):
+            self.board = Board.from_settings(self.settings, self.rng, metrics=self.metrics)
+        if self.metrics is not None:
+            self.instrument(self.metrics)
         self.deletes = {1: self.settings.num_deletes, 2: self.settings.num_deletes}
         self.creates = {1: self.settings.num_creates, 2: self.settings.num_creates}
         self.turn_number: int = 1
         self.turn = 1
+        self.winner: int | None = None
+        self.journal: list[tuple[Callable[..., Any], tuple]] | None = None
+        self.state_hash = self.compute_state_hash()
+        self.start_turn()
+        self.position_counts: Counter[int] = Counter([self.hash])
+
+    def instrument(self, metrics: Metrics) -> None:
+        for name, phase in TIMED_PHASES.items():
+            setattr(self, name, metrics.timed(phase, getattr(self, name)))
+        self.calculate_move = metrics.depth_tracked("calculate_move_depth", self.calculate_move)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # copies sent to other processes go uninstrumented, the wrappers only report to this process
+        state = self.__dict__.copy()
+        for name in (*TIMED_PHASES, "calculate_move"):
+            state.pop(name, None)
+        state["metrics"] = None
+        return state
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot.take(self)
+
+    def branch(self, snapshot: Snapshot | None = None) -> "Game":
+        # a separate game from the snapshot, or from here; it shares nothing mutable with this one
+        game = copy.copy(self)
+        game.rng, game.bots, game.journal = random.Random(), {}, None
+        (snapshot or self.snapshot()).restore(game)
+        return game
+
+    @property
+    def hash(self) -> int:
+        return self.board.hash ^ self.state_hash
+
+    def compute_state_hash(self) -> int:
+        state_hash = SIDE_KEY if self.turn == 2 else 0
+        for player in (1, 2):
+            state_hash ^= counter_key("deletes", player, self.deletes[player])
+            state_hash ^= counter_key("creates", player, self.creates[player])
+            for powerup in POWERUPS:
+                state_hash ^= counter_key("powerup", player, powerup, self.inventory[player].count(powerup))
+        # a piece on a crumbly shows as the piece, but leaves a blank rather than a regular cell when it moves on
+        for coord in self.board.crumblies:
+            if self.board.grid[coord] in (Cell.O, Cell.X):
+                state_hash ^= counter_key("crumbly", coord)
+        return state_hash
+
+    def record(self, function: Callable[..., Any], *args: Any) -> None:
+        if self.journal is not None:
+            self.journal.append((function, args))
+
+    def set_char(self, coord: tuple[int, int], new_char: str) -> None:
+        self.record(self.board.replace_char, coord, self.board.get_char(coord))
+        self.board.replace_char(coord, new_char)
+
+    def add_item(self, items: list, item: Any) -> None:
+        items.append(item)
+        self.record(items.pop)
+
+    def remove_item(self, items: list, item: Any) -> None:
+        index = items.index(item)
+        del items[index]
+        self.record(items.insert, index, item)
+
+    def add_member(self, members: set, item: Any) -> None:
+        if item not in members:
+            members.add(item)
+            self.record(members.remove, item)
+
+    def remove_member(self, members: set, item: Any) -> None:
+        members.remove(item)
+        self.record(members.add, item)
+
+    def add_piece(self, player: int, coord: tuple[int, int]) -> None:
+        self.board.add_piece(player, coord)
+        self.record(self.board.remove_piece, player, coord)
+
+    def remove_piece(self, player: int, coord: tuple[int, int]) -> None:
+        index = self.board.remove_piece(player, coord)
+        self.record(self.board.add_piece, player, coord, index)
+
+    def gain_powerup(self, powerup: str) -> None:
+        held = self.inventory[self.turn].count(powerup)
+        self.state_hash ^= counter_key("powerup", self.turn, powerup, held) ^ counter_key("powerup", self.turn, powerup, held + 1)
+        self.add_item(self.inventory[self.turn], powerup)
+
+    def spend_powerup(self, powerup: str) -> None:
+        held = self.inventory[self.turn].count(powerup)
+        self.state_hash ^= counter_key("powerup", self.turn, powerup, held) ^ counter_key("powerup", self.turn, powerup, held - 1)
+        self.remove_item(self.inventory[self.turn], powerup)
+
+    def spend_count(self, name: str) -> None:
+        counts = getattr(self, name)
+        remaining = counts[self.turn]
+        self.state_hash ^= counter_key(name, self.turn, remaining) ^ counter_key(name, self.turn, remaining - 1)
+        counts[self.turn] = remaining - 1
+        self.record(counts.__setitem__, self.turn, remaining)
+
+    def start_turn(self) -> None:
+        if self.turn_number % self.settings.powerup_frequency == 0:
+            coord = self.board.place_powerup(self.rng)
+            if coord is None:
+                return
+            self.record(self.board.replace_char, coord, "/")
+            self.record(self.board.powerups.remove, coord)
 
-    def edit_coord(self, prompt: str, target_char: str, new_char: str) -> tuple[int, int] | None:
+    def end_turn(self) -> None:
+        self.turn = 3 - self.turn
+        self.turn_number += 1
+        self.state_hash ^= SIDE_KEY
+        self.start_turn()
+
+    def choose_coord(self, prompt: str, target_char: str,
+                     taken: tuple[tuple[int, int], ...] = ()) -> tuple[int, int] | None:
         while True:
             coord = get_valid_coord(prompt, self.settings.length, self.settings.width)
             if coord is None:
                 return None
-            if self.board.get_char(coord) == target_char:
-                self.board.replace_char(coord, new_char)
+            if self.board.get_char(coord) == target_char and coord not in taken:
                 return coord
             print(f"Coordinate does not correspond to {target_char}")
 
@@ -47,47 +184,49 @@ class Game:
         return destination
 
     def update_portals(self, coord: tuple[int, int]) -> tuple[int, int]:
-        for portal in self.board.portals:
-            if portal.is_member(coord):
-                self.board.replace_char(coord, "/")
-                destination = portal.get_opposite(coord)
-                self.board.portals.remove(portal)
-                return destination
-        raise ValueError("Coord is not a portal")
+        portal = self.board.portal_at.get(coord)
+        if portal is None:
+            raise ValueError("Coord is not a portal")
+        self.set_char(coord, "/")
+        self.record(self.board.add_portal, portal, self.board.remove_portal(portal))
+        return portal.get_opposite(coord)
 
     def process_move(self, origin: tuple[int, int], destination: tuple[int, int]) -> None:
         if origin in self.board.crumblies:
-            self.board.crumblies.remove(origin)
-            self.board.replace_char(origin, " ")
+            self.state_hash ^= counter_key("crumbly", origin)
+            self.remove_member(self.board.crumblies, origin)
+            self.set_char(origin, " ")
         else:
-            self.board.replace_char(origin, "/")
+            self.set_char(origin, "/")
         destination_char = self.board.get_char(destination)
         if destination_char == "?":
-            self.inventory[self.turn].append(random.choice(POWERUPS))
-            print(f"Player {self.turn} picked up a {self.inventory[self.turn][-1]}!")
+            self.remove_member(self.board.powerups, destination)
+            self.gain_powerup(self.rng.choice(POWERUPS))
         elif destination_char == "@":
             destination = self.update_portals(destination)
         elif destination_char == "~":
-            self.board.crumblies.append(destination)
+            self.state_hash ^= counter_key("crumbly", destination)
+            self.add_member(self.board.crumblies, destination)
         elif destination_char == self.target_char:  # capture their piece
-            self.board.dot_coords[3 - self.turn].remove(destination)
-        self.board.replace_char(destination, self.ally_char)
-        self.board.dot_coords[self.turn].append(destination)
-        self.board.dot_coords[self.turn].remove(origin)
-        self.board.dot_coords[self.turn].sort(key=lambda x: (x[0], x[1]))
+            self.remove_piece(3 - self.turn, destination)
+        self.set_char(destination, self.ally_char)
+        self.remove_piece(self.turn, origin)
+        self.add_piece(self.turn, destination)
 
     def get_origin(self) -> tuple[int, int] | None:
         prompt = "Which dot would you like to move?"
-        for i, coord in enumerate(self.board.dot_coords[self.turn], start=1):
+        origins = sorted(self.board.dot_coords[self.turn])
+        for i, coord in enumerate(origins, start=1):
             prompt += f"\n{i}) {coord_to_string(coord)}"
-        exit_num = len(self.board.dot_coords[self.turn]) + 1
+        exit_num = len(origins) + 1
         prompt += f"\n{exit_num}) Cancel\n"
         selected = get_valid_int(prompt, 1, exit_num)
         if selected == exit_num:
             return None
-        return self.board.dot_coords[self.turn][selected - 1]
+        return origins[selected - 1]
 
-    def detect_moves(self, origin: tuple[int, int], vectors: list[tuple[int, int]]) -> dict[str, tuple[int, int]]:
+    def detect_moves(self, origin: tuple[int, int],
+                     vectors: tuple[tuple[int, int], ...]) -> dict[str, tuple[int, int]]:
         moves = {key: self.calculate_move(origin, vector) for key, vector in zip("DASW", vectors)}
         return {direction: move for direction, move in moves.items() if move is not None}
 
@@ -103,11 +242,12 @@ class Game:
             return None
         return moves[wasd]
 
-    def attempt_move(self, vectors: list[tuple[int, int]]) -> bool:
+    def choose_move(self, kind: ActionKind) -> Action | None:
+        vectors = DOUBLE_JUMP_VECTORS if kind is ActionKind.DOUBLE_JUMP else MOVE_VECTORS
         while True:
             origin = self.get_origin()
             if origin is None:
-                return False
+                return None
             moves = self.detect_moves(origin, vectors)
             if not moves:
                 print("This dot cannot move.")
@@ -115,32 +255,28 @@ class Game:
             break
         destination = self.get_destination(moves)
         if destination is None:
-            return False
-        self.process_move(origin, destination)
-        return True
+            return None
+        return Action(kind, (origin, destination))
 
     def check_defeat(self) -> bool:
-        for row in self.board.field:
-            for char in row:
-                if char == self.target_char:
-                    return False
-        return True
-
-    def handle_delete_create(self, action_name: str, count_dict: dict[int, int],
-                             prompt: str, target_char: str, new_char: str) -> bool:
+        return self.board.piece_count(3 - self.turn) == 0
+
+    def choose_delete_create(self, kind: ActionKind, count_dict: dict[int, int],
+                             prompt: str, target_char: str) -> Action | None:
+        action_name = kind.value.lower()
         if count_dict[self.turn] == 0:
             print(f"You have run out of {action_name}s")
-            return False
+            return None
         print(f"Number of {action_name}s remaining: {count_dict[self.turn]}")
-        if self.edit_coord(prompt, target_char, new_char) is None:
-            return False
-        count_dict[self.turn] -= 1
-        return True
+        coord = self.choose_coord(prompt, target_char)
+        if coord is None:
+            return None
+        return Action(kind, (coord,))
 
-    def use_powerup(self) -> bool:
+    def choose_powerup(self) -> Action | None:
         if not self.inventory[self.turn]:
             print("You don't have any powerups")
-            return False
+            return None
         prompt = "Which one would you like to use?\n"
         for i, powerup in enumerate(self.inventory[self.turn]):
             prompt += f"{i + 1}) {powerup}\n"
@@ -148,55 +284,109 @@ class Game:
         prompt += f"{exit_num}) Cancel\n"
         choice = get_valid_int(prompt, 1, exit_num)
         if choice == exit_num:
-            return False
-        chosen_powerup = self.inventory[self.turn][choice - 1]
-        if chosen_powerup == "Portal":
-            coord_1 = self.edit_coord("Where would you like the entrance to your portal?", "/", "@")
+            return None
+        kind = ActionKind(self.inventory[self.turn][choice - 1])
+        if kind is ActionKind.PORTAL:
+            coord_1 = self.choose_coord("Where would you like the entrance to your portal?", "/")
             if coord_1 is None:
-                return False
-            coord_2 = self.edit_coord("Where would you like the exit to your portal", "/", "@")
+                return None
+            coord_2 = self.choose_coord("Where would you like the exit to your portal", "/", (coord_1,))
             if coord_2 is None:
-                self.board.replace_char(coord_1, "/")  # undo the first portal
-                return False
-            self.board.portals.append(Portal(coord_1, coord_2))
-        elif chosen_powerup == "Double-Jump":
-            return self.attempt_move([[0, 2], [0, -2], [2, 0], [-2, 0]])
-        elif chosen_powerup == "Destroyer":
-            return self.edit_coord("Which barrier would you like to destroy?", "#", "/") is None
-        del (self.inventory[self.turn][choice - 1])
-        return True
+                return None
+            return Action(kind, (coord_1, coord_2))
+        elif kind is ActionKind.DOUBLE_JUMP:
+            return self.choose_move(kind)
+        coord = self.choose_coord("Which barrier would you like to destroy?", "#")
+        return None if coord is None else Action(kind, (coord,))
+
+    def hint(self) -> str:
+        # small boards get their table built on demand, anything else gets a short search
+        solved = best_action(self, build=max(self.board.length, self.board.width) <= TABLEBASE_MAX_SIZE)
+        if solved is not None:
+            action, value = solved
+            outcome = f"wins in {value} plies" if value > 0 else f"loses in {-value} plies" if value < 0 else "draws"
+            return f"Hint: {action} ({outcome} with perfect play)"
+        bot = AlphaBetaBot(time_budget=1.0)
+        return f"Hint: {bot.choose(self)} ({bot.last_result})"
+
+    def choose_action(self) -> Action | str | None:
+        while True:
+            option = get_valid_int("What would you like to do?\n1) Move\n2) Delete a space\n3) Create a space\n"
+                                   "4) Use a powerup\n5) Concede\n6) Hint\n7) Undo\n8) Redo\n", 1, 8)
+            if option != 6:
+                break
+            # printed under the prompt, returning would redraw the frame over it
+            print(self.hint())
+        if option == 1:
+            return self.choose_move(ActionKind.MOVE)
+        elif option == 2:
+            return self.choose_delete_create(ActionKind.DELETE, self.deletes, "Which space would you like to delete?", "/")
+        elif option == 3:
+            return self.choose_delete_create(ActionKind.CREATE, self.creates, "Which space would you like to create?", " ")
+        elif option == 4:
+            return self.choose_powerup()
+        elif option in (7, 8):
+            return "undo" if option == 7 else "redo"
+        elif confirm("Are you sure?"):
+            return Action(ActionKind.CONCEDE)
+        return None
 
     def score_save(self) -> None:
         if confirm("Would you like to save your scores?"):
-            scores = import_2d(SCORES_PATH)
-            scores.append([input("Enter your names"), self.board.length, self.board.width, self.settings.num_dots, self.turn_number])
-            export_2d(SCORES_PATH, scores)
+            store = ScoreStore()
+            store.add(input("Enter your names"), self.board.length, self.board.width, self.settings.num_dots, self.turn_number)
+            store.close()
+
+    def step_history(self, history: History, writer: GameWriter, direction: str) -> list[str]:
+        # bots reply straight away, so each step goes to the next position a person is to move in
+        def stop(snapshot: Snapshot) -> bool:
+            return snapshot.turn not in self.bots or snapshot.winner is not None
+        if direction == "undo":
+            steps = history.undo(self, stop)
+            if steps:
+                writer.rewind(len(steps))
+        else:
+            steps = history.redo(self, stop)
+            for snapshot in steps:
+                snapshot.restore(self)
+                writer.record(self, snapshot.action)
+        if not steps:
+            return [f"Nothing to {direction}"]
+        return [f"{direction.capitalize()}: {len(steps)} turn{'s' if len(steps) > 1 else ''}"]
 
     def play(self) -> None:
-        while True:
-            if self.turn_number % self.settings.powerup_frequency == 0:
-                self.board.place_powerup()
-            self.board.show()
-            print(f"Player {self.turn}'s Turn\t\t\tTurn: {self.turn_number}")
-            option = get_valid_int("What would you like to do?\n1) Move\n2) Delete a space\n"
-                                   "3) Create a space\n4) Use a powerup\n5) Concede\n", 1, 5)
-            if option == 1 and not self.attempt_move([[0, 1], [0, -1], [1, 0], [-1, 0]]):
-                continue
-            elif option == 2 and not self.handle_delete_create("delete", self.deletes, "Which space would you like to delete?", "/", " "):
-                continue
-            elif option == 3 and not self.handle_delete_create("create", self.creates, "Which space would you like to create?", " ", "/"):
+        writer = GameWriter(RECORDS_PATH / f"{time.strftime('%Y%m%d-%H%M%S')}-{self.seed:016x}.dotr", self)
+        renderer = Renderer()
+        history = History(self.snapshot())
+        # messages about the last turn are drawn with the next frame so an incremental redraw cannot wipe them
+        messages: list[str] = []
+        while self.winner is None:
+            with timer(self.metrics, "render"):
+                renderer.draw(self.board, *messages, f"Player {self.turn}'s Turn\t\t\tTurn: {self.turn_number}")
+            messages = []
+            if self.turn in self.bots:
+                bot = self.bots[self.turn]
+                with timer(self.metrics, "bot_search"):
+                    action = bot.choose(self)
+                messages.append(f"Computer plays {action} ({bot.last_result})")
+            else:
+                with timer(self.metrics, "input_wait"):
+                    action = self.choose_action()
+            if action is None:
                 continue
-            elif option == 4 and not self.use_powerup():
+            if isinstance(action, str):
+                messages += self.step_history(history, writer, action)
                 continue
-            elif option == 5 and confirm("Are you sure?"):
-                break
-            if self.check_defeat():
-                self.board.show()
-                break
-            self.turn = 1 if self.turn == 2 else 2
-            self.turn_number += 1
-        print(f"Player {self.turn} has won in {self.turn_number} turns!")
+            player, held = self.turn, len(self.inventory[self.turn]) - (action.kind in POWERUP_ACTIONS)
+            apply(self, action)
+            history.push(self, action)
+            writer.record(self, action)
+            if len(self.inventory[player]) > held:
+                messages.append(f"Player {player} picked up a {self.inventory[player][-1]}!")
+        writer.close()
+        renderer.draw(self.board, *messages, f"Player {self.winner} has won in {self.turn_number} turns!")
         self.score_save()
+        renderer.close()
 
     @property
     def target_char(self) -> str:
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import copy
+import math
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .bot import order_actions, search_actions
+from .constants import MOVE_VECTORS
+from .engine import Action, ActionKind, Undo, apply, move_actions, undo
+from .tablebase import best_action
+
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+
+    from .game import Game
+
+PLAYOUT_PLIES = 40
+
+
+@dataclass
+class ChanceNode:
+    visits: int = 0
+    wins: float = 0.0
+    outcomes: dict[int, DecisionNode] = field(default_factory=dict)
+
+
+@dataclass
+class DecisionNode:
+    untried: list[Action]
+    children: dict[Action, ChanceNode] = field(default_factory=dict)
+    visits: int = 0
+
+
+@dataclass
+class MCTSResult:
+    action: Action
+    visits: int
+    win_rate: float
+    iterations: int
+    elapsed: float
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        if not self.iterations:
+            return f"tablebase, win rate {self.win_rate:.0%}"
+        return (f"{self.iterations:,} playouts, {self.iterations_per_second:,.0f} playouts/s, "
+                f"win rate {self.win_rate:.0%}")
+
+
+def new_node(game: Game) -> DecisionNode:
+    if game.winner is not None:
+        return DecisionNode([])
+    return DecisionNode(order_actions(game, search_actions(game), None)[::-1])
+
+
+def outcome(game: Game) -> float:
+    if game.winner is not None:
+        return 1.0 if game.winner == 1 else 0.0
+    difference = game.board.piece_count(1) - game.board.piece_count(2)
+    return 0.5 if difference == 0 else float(difference > 0)
+
+
+def playout(game: Game, records: list[Undo]) -> float:
+    for _ in range(PLAYOUT_PLIES):
+        if game.winner is not None:
+            break
+        actions = move_actions(game, ActionKind.MOVE, MOVE_VECTORS)
+        if not actions:
+            break
+        captures = [action for action in actions if game.board.get_char(action.destination) == game.target_char]
+        records.append(apply(game, game.rng.choice(captures or actions)))
+    return outcome(game)
+
+
+def select(node: DecisionNode, exploration: float) -> tuple[Action, ChanceNode]:
+    log_visits = math.log(node.visits)
+    return max(node.children.items(),
+               key=lambda item: item[1].wins / item[1].visits + exploration * math.sqrt(log_visits / item[1].visits))
+
+
+def search(game: Game, time_budget: float, iterations: int | None = None,
+           exploration: float = 1.4) -> tuple[dict[Action, tuple[int, float]], int]:
+    deadline = time.perf_counter() + time_budget
+    root = new_node(game)
+    completed = 0
+    while (iterations is None or completed < iterations) and time.perf_counter() < deadline:
+        node, path, records = root, [], []
+        while game.winner is None and (node.untried or node.children):
+            if node.untried:
+                action = node.untried.pop()
+                child = node.children[action] = ChanceNode()
+            else:
+                action, child = select(node, exploration)
+            node.visits += 1
+            path.append((child, game.turn))
+            records.append(apply(game, action))
+            # the action's random draws (powerup type, spawn cell) pick the chance outcome
+            next_node = child.outcomes.get(game.hash)
+            if next_node is None:
+                child.outcomes[game.hash] = new_node(game)
+                break
+            node = next_node
+        reward = playout(game, records)
+        for record in reversed(records):
+            undo(game, record)
+        for child, mover in path:
+            child.visits += 1
+            child.wins += reward if mover == 1 else 1 - reward
+        completed += 1
+    return {action: (child.visits, child.wins) for action, child in root.children.items()}, completed
+
+
+def run_search(arguments: tuple[Game, float, int | None, float, int]) -> tuple[dict[Action, tuple[int, float]], int]:
+    game, time_budget, iterations, exploration, seed = arguments
+    game.rng.seed(seed)
+    return search(game, time_budget, iterations, exploration)
+
+
+@dataclass
+class MCTSBot:
+    time_budget: float = 1.0
+    iterations: int | None = None
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    exploration: float = 1.4
+
+    def __post_init__(self) -> None:
+        self.pool: Pool | None = None
+        self.last_result: MCTSResult | None = None
+
+    def choose(self, game: Game) -> Action:
+        start = time.perf_counter()
+        solved = best_action(game)
+        if solved is not None:
+            action, value = solved
+            win_rate = 1.0 if value > 0 else 0.0 if value < 0 else 0.5
+            self.last_result = MCTSResult(action, 0, win_rate, 0, time.perf_counter() - start)
+            return action
+        # searching draws from the game's generator, which must not change the real game's future draws
+        rng_state = game.rng.getstate()
+        if self.workers == 1:
+            results = [search(game, self.time_budget, self.iterations, self.exploration)]
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            state = copy.copy(game)
+            state.bots = {}
+            results = self.pool.map(run_search, [(state, self.time_budget, self.iterations, self.exploration,
+                                                  game.rng.getrandbits(32)) for _ in range(self.workers)])
+        game.rng.setstate(rng_state)
+        merged: dict[Action, list[float]] = {}
+        for stats, _ in results:
+            for action, (visits, wins) in stats.items():
+                totals = merged.setdefault(action, [0, 0.0])
+                totals[0] += visits
+                totals[1] += wins
+        if not merged:
+            action, visits, wins = Action(ActionKind.CONCEDE), 0, 0.0
+        else:
+            action, (visits, wins) = max(merged.items(), key=lambda item: item[1][0])
+        win_rate = wins / visits if visits else 0.0
+        self.last_result = MCTSResult(action, int(visits), win_rate, sum(completed for _, completed in results),
+                                      time.perf_counter() - start)
+        return action
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
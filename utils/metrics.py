@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def merge(self, other: Timing) -> None:
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+
+@dataclass
+class Metrics:
+    timings: defaultdict[str, Timing] = field(default_factory=lambda: defaultdict(Timing))
+    counters: Counter[str] = field(default_factory=Counter)
+    histograms: defaultdict[str, Counter[int]] = field(default_factory=lambda: defaultdict(Counter))
+
+    def observe(self, phase: str, seconds: float) -> None:
+        self.timings[phase].add(seconds)
+
+    @contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def record_value(self, name: str, value: int) -> None:
+        self.histograms[name][value] += 1
+
+    def timed(self, phase: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        timing = self.timings[phase]
+        clock = time.perf_counter
+
+        def wrapper(*args: Any) -> Any:
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                timing.add(clock() - start)
+        return wrapper
+
+    def depth_tracked(self, name: str, function: Callable[..., Any]) -> Callable[..., Any]:
+        # records how deep each outermost call went, recursive calls must go through the wrapper
+        histogram = self.histograms[name]
+        depth = deepest = 0
+
+        def wrapper(*args: Any) -> Any:
+            nonlocal depth, deepest
+            depth += 1
+            deepest = max(deepest, depth)
+            try:
+                return function(*args)
+            finally:
+                depth -= 1
+                if depth == 0:
+                    histogram[deepest] += 1
+                    deepest = 0
+        return wrapper
+
+    def merge(self, other: Metrics) -> None:
+        for phase, timing in other.timings.items():
+            self.timings[phase].merge(timing)
+        self.counters.update(other.counters)
+        for name, histogram in other.histograms.items():
+            self.histograms[name].update(histogram)
+
+    def reset(self) -> None:
+        # cleared in place, so wrappers already installed keep reporting here
+        for timing in self.timings.values():
+            timing.count, timing.total, timing.maximum = 0, 0.0, 0.0
+        self.counters.clear()
+        for histogram in self.histograms.values():
+            histogram.clear()
+
+    def as_dict(self) -> dict:
+        return {"timings": {phase: {"count": timing.count, "total_seconds": timing.total,
+                                    "mean_seconds": timing.total / timing.count if timing.count else 0.0,
+                                    "max_seconds": timing.maximum}
+                            for phase, timing in sorted(self.timings.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: {str(value): count for value, count in sorted(histogram.items())}
+                               for name, histogram in sorted(self.histograms.items())}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "dotto") -> str:
+        lines = [f"# TYPE {prefix}_phase_seconds summary"]
+        for phase, timing in sorted(self.timings.items()):
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {timing.total:.9f}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{phase}"}} {timing.count}')
+        lines.append(f"# TYPE {prefix}_phase_seconds_max gauge")
+        for phase, timing in sorted(self.timings.items()):
+            lines.append(f'{prefix}_phase_seconds_max{{phase="{phase}"}} {timing.maximum:.9f}')
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            cumulative = 0
+            for value, count in sorted(histogram.items()):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{le="{value}"}} {cumulative}')
+            lines.append(f'{prefix}_{name}_bucket{{le="+Inf"}} {cumulative}')
+            lines.append(f"{prefix}_{name}_sum {sum(value * count for value, count in histogram.items())}")
+            lines.append(f"{prefix}_{name}_count {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def timer(metrics: Metrics | None, phase: str) -> AbstractContextManager:
+    return nullcontext() if metrics is None else metrics.time(phase)
@@ -24,14 +24,16 @@ def letters_to_index(letters: str) -> int:
     return index - 1
 
 
+def index_to_letters(index: int) -> str:
+    letters = []
+    while index >= 0:
+        letters.append(chr(index % 26 + ord('A')))
+        index = index // 26 - 1
+    return ''.join(reversed(letters))
+
+
 def coord_to_string(coord: tuple[int, int]) -> str:
-    col_num = coord[0]
-    col_parts = []
-    while col_num >= 0:
-        col_parts.append(chr(col_num % 26 + ord('A')))
-        col_num = col_num // 26 - 1
-    col_str = ''.join(reversed(col_parts))
-    return f"{coord[1] + 1}{col_str}"
+    return f"{coord[1] + 1}{index_to_letters(coord[0])}"
 
 
 def string_to_coord(string: str) -> tuple[int, int]:
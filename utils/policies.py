@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import random
+from functools import partial
+from typing import TYPE_CHECKING, Callable
+
+from .bot import AlphaBetaBot, search_actions
+from .engine import Action, ActionKind, legal_actions
+from .mcts import MCTSBot
+
+if TYPE_CHECKING:
+    from .game import Game
+
+Policy = Callable[["Game"], Action]
+
+
+def playable_actions(game: Game) -> list[Action]:
+    return search_actions(game) or legal_actions(game)
+
+
+def random_policy(game: Game, rng: random.Random) -> Action:
+    # uniform over every legal action but conceding, which it only plays when there is nothing else. Portal pairs are
+    # counted rather than listed, there is one for every two regular cells
+    actions = legal_actions(game, portal_pairs=False)[:-1]
+    if ActionKind.PORTAL.value in game.inventory[game.turn]:
+        free = game.board.scan_char_coords("/")
+        if rng.randrange(len(actions) + len(free) * (len(free) - 1) // 2) >= len(actions):
+            return Action(ActionKind.PORTAL, tuple(sorted(rng.sample(free, 2))))
+    return rng.choice(actions) if actions else Action(ActionKind.CONCEDE)
+
+
+def greedy_policy(game: Game, rng: random.Random) -> Action:
+    actions = playable_actions(game)
+    moves = [action for action in actions if action.kind in (ActionKind.MOVE, ActionKind.DOUBLE_JUMP)]
+    captures = [action for action in moves if game.board.get_char(action.destination) == game.target_char]
+    pickups = [action for action in moves if game.board.get_char(action.destination) == "?"]
+    return rng.choice(captures or pickups or moves or actions)
+
+
+# each factory takes the policy's own generator, so policies never disturb the game's draws
+POLICIES: dict[str, Callable[[random.Random], Policy]] = {
+    "random": lambda rng: partial(random_policy, rng=rng),
+    "greedy": lambda rng: partial(greedy_policy, rng=rng),
+    "alphabeta": lambda rng: AlphaBetaBot(time_budget=0.05).choose,
+    "mcts": lambda rng: MCTSBot(time_budget=0.05, workers=1).choose,
+}
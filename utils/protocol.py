@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field, fields
+from typing import TextIO
+
+from .bot import AlphaBetaBot
+from .constants import CELL_CHARS, TRIANGLE_NUMBERS
+from .engine import ActionKind, Undo, apply, is_legal, legal_actions, parse_action, undo
+from .game import Game
+from .settings_data import SettingsData
+from .zobrist import TranspositionTable
+
+# blanks are sent as "_" so that every token on a line is whitespace free
+WIRE_CHARS = CELL_CHARS.replace(" ", "_")
+SETTING_NAMES = {setting.name for setting in fields(SettingsData)}
+# any two distinct regular cells, listing every pair would hang on a large board
+ANY_PORTAL = f"{ActionKind.PORTAL.value} * *"
+SETTING_LIMITS = {"length": (5, 99), "width": (5, 99), "num_dots": (1, 999), "powerup_frequency": (1, 999),
+                  "barrier_density": (2, 99)}
+
+
+def parse_settings(pairs: list[str]) -> SettingsData:
+    settings = SettingsData()
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        lower, upper = SETTING_LIMITS.get(name, (0, 999))
+        if name not in SETTING_NAMES or not value.isdigit() or not lower <= int(value) <= upper:
+            raise ValueError(f"Invalid setting '{pair}'")
+        setattr(settings, name, int(value))
+    # as in the settings menu, each side's starting triangle has to stay clear of the other's
+    max_dots = TRIANGLE_NUMBERS[min(min(settings.length, settings.width) - 2, len(TRIANGLE_NUMBERS) - 1)]
+    if settings.num_dots > max_dots:
+        raise ValueError(f"At most {max_dots} dots fit on a {settings.length}x{settings.width} board")
+    if not settings.barriers_fit():
+        raise ValueError(f"Barriers at density {settings.barrier_density} cannot fit on a "
+                         f"{settings.length}x{settings.width} board with {settings.num_dots} dots")
+    return settings
+
+
+def start_game(settings: SettingsData, seed: int | None = None) -> Game:
+    # a board that cannot be generated is reported to the client rather than ending the session
+    try:
+        return Game(settings, seed=seed)
+    except ValueError:
+        raise
+    except Exception as error:
+        raise ValueError(f"Cannot generate a board: {error!r}") from error
+
+
+def legal_line(game: Game) -> str:
+    actions = [str(action) for action in legal_actions(game, portal_pairs=False)]
+    if ActionKind.PORTAL.value in game.inventory[game.turn] and game.winner is None:
+        actions.insert(-1, ANY_PORTAL)
+    return "legal " + ";".join(actions)
+
+
+def board_line(game: Game) -> str:
+    rows = ["".join(WIRE_CHARS[cell] for cell in row) for row in game.board.grid.tolist()]
+    return f"board {game.board.length} {game.board.width} {' '.join(rows)}"
+
+
+def inventory_line(game: Game, player: int) -> str:
+    return (f"inventory {player} {','.join(game.inventory[player]) or '-'} "
+            f"{game.deletes[player]} {game.creates[player]}")
+
+
+def state_lines(game: Game) -> list[str]:
+    if game.winner is not None:
+        return [f"winner {game.winner} {game.turn_number}"]
+    return [f"turn {game.turn} {game.turn_number}", inventory_line(game, game.turn)]
+
+
+@dataclass
+class EngineProtocol:
+    input: TextIO = sys.stdin
+    output: TextIO = sys.stdout
+    table: TranspositionTable = field(default_factory=lambda: TranspositionTable(1 << 18))
+
+    def __post_init__(self) -> None:
+        self.game: Game | None = None
+        # the engine's undo leaves the generator alone, so each entry keeps the state to rewind it to
+        self.history: list[tuple[Undo, tuple]] = []
+
+    def send(self, *lines: str) -> None:
+        self.output.write("".join(line + "\n" for line in lines))
+        self.output.flush()
+
+    def run(self) -> None:
+        for line in self.input:
+            command, _, argument = line.strip().partition(" ")
+            if not command:
+                continue
+            if command == "quit":
+                break
+            try:
+                self.dispatch(command, argument.split())
+            except ValueError as error:
+                self.send(f"error {error}")
+
+    def dispatch(self, command: str, arguments: list[str]) -> None:
+        if command == "dotto":
+            self.send("id name Dotto", *(f"option {setting.name} {setting.default}"
+                                         for setting in fields(SettingsData)), "dottook")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "newgame":
+            self.new_game(arguments)
+        elif self.game is None:
+            raise ValueError("No game in progress")
+        elif command == "position":
+            self.position(arguments)
+        elif command == "legal":
+            self.send(legal_line(self.game))
+        elif command == "go":
+            self.go(arguments)
+        elif command == "action":
+            self.act(" ".join(arguments))
+            self.send(*state_lines(self.game))
+        elif command == "undo":
+            if not self.history:
+                raise ValueError("Nothing to undo")
+            self.take_back()
+            self.send(*state_lines(self.game))
+        else:
+            raise ValueError(f"Unknown command '{command}'")
+
+    def new_game(self, arguments: list[str]) -> None:
+        seed = None
+        pairs = []
+        for pair in arguments:
+            if pair.startswith("seed="):
+                if not pair[5:].isdigit():
+                    raise ValueError(f"Invalid setting '{pair}'")
+                seed = int(pair[5:])
+            else:
+                pairs.append(pair)
+        self.game = start_game(parse_settings(pairs), seed)
+        self.history = []
+        self.table.clear()
+        self.send(f"seed {self.game.seed}", *self.position_lines())
+
+    def position(self, arguments: list[str]) -> None:
+        # "position" reports the current position, "position actions A;B" replays from the start
+        if arguments:
+            if arguments[0] != "actions":
+                raise ValueError(f"Unknown position argument '{arguments[0]}'")
+            while self.history:
+                self.take_back()
+            for text in " ".join(arguments[1:]).split(";"):
+                if text.strip():
+                    self.act(text)
+        self.send(*self.position_lines())
+
+    def position_lines(self) -> list[str]:
+        game = self.game
+        return [board_line(game), inventory_line(game, 1), inventory_line(game, 2),
+                f"hash {game.hash:016x}", *state_lines(game)]
+
+    def act(self, text: str) -> None:
+        action = parse_action(text)
+        if self.game.winner is not None:
+            raise ValueError("The game is over")
+        if not is_legal(self.game, action):
+            raise ValueError(f"Illegal action {action}")
+        rng_state = self.game.rng.getstate()
+        self.history.append((apply(self.game, action), rng_state))
+
+    def take_back(self) -> None:
+        record, rng_state = self.history.pop()
+        undo(self.game, record)
+        self.game.rng.setstate(rng_state)
+
+    def go(self, arguments: list[str]) -> None:
+        if self.game.winner is not None:
+            raise ValueError("The game is over")
+        limits = {"movetime": 1000, "depth": 64}
+        if len(arguments) % 2:
+            raise ValueError("Limits come in name value pairs")
+        for name, value in zip(arguments[::2], arguments[1::2]):
+            if name not in limits or not value.isdigit() or int(value) == 0:
+                raise ValueError(f"Invalid limit '{name} {value}'")
+            limits[name] = int(value)
+        bot = AlphaBetaBot(limits["movetime"] / 1000, limits["depth"], self.table)
+        action = bot.choose(self.game)
+        result = bot.last_result
+        self.send(f"info depth {result.depth} score {result.score} nodes {result.nodes} "
+                  f"nps {result.nodes_per_second:.0f} time {result.elapsed * 1000:.0f}",
+                  f"bestaction {action}")
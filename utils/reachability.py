@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .constants import MOVE_VECTORS, Cell
+
+if TYPE_CHECKING:
+    from .board import Board
+
+# plain ints, enum member lookups are too slow for code that runs on every cell change
+BLANK, BARRIER, O, X = int(Cell.BLANK), int(Cell.BARRIER), int(Cell.O), int(Cell.X)
+
+
+class Reachability:
+    # sight[d][i] is the first non-blank cell reached from cell i sliding along MOVE_VECTORS[d], or -1 off the board.
+    # A move lands exactly there, so one lookup replaces the slide in Game.calculate_move. Both maps are kept in step
+    # with every cell change, which only rescans the lines through that cell.
+
+    def __init__(self, board: Board) -> None:
+        self.board = board
+        self.length, self.width = board.length, board.width
+        # a list mirror of the grid, scalar reads from numpy would dominate the cost
+        self.cells = cells = board.grid.ravel().tolist()
+        self.sight = [[-1] * len(cells) for _ in MOVE_VECTORS]
+        for direction, (dx, dy) in enumerate(MOVE_VECTORS):
+            for start in self.line_starts(dx, dy):
+                seen = -1
+                # walk against the direction, so each cell learns what lies ahead of it
+                x, y = start
+                while 0 <= x < self.length and 0 <= y < self.width:
+                    index = x * self.width + y
+                    self.sight[direction][index] = seen
+                    if cells[index] != BLANK:
+                        seen = index
+                    x, y = x - dx, y - dy
+        # cell indices of each player's pieces that an enemy piece can capture with its next move
+        self.threatened: dict[int, set[int]] = {1: set(), 2: set()}
+        for player in (1, 2):
+            for coord in board.dot_coords[player]:
+                self.refresh_threat(coord[0] * self.width + coord[1])
+
+    def line_starts(self, dx: int, dy: int) -> list[tuple[int, int]]:
+        # the last cell of every line along (dx, dy)
+        if dx == 0:
+            return [(x, self.width - 1 if dy > 0 else 0) for x in range(self.length)]
+        return [(self.length - 1 if dx > 0 else 0, y) for y in range(self.width)]
+
+    def moves(self, player: int) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+        # (origin, destination) of every move, in the order Game.detect_moves finds them
+        own, cells, width = O if player == 1 else X, self.cells, self.width
+        found = []
+        for origin in self.board.dot_coords[player]:
+            index = origin[0] * width + origin[1]
+            for sight in self.sight:
+                landing = sight[index]
+                if landing >= 0 and cells[landing] != BARRIER and cells[landing] != own:
+                    found.append((origin, divmod(landing, width)))
+        return found
+
+    def refresh_threat(self, index: int) -> None:
+        cell = self.cells[index]
+        if cell == O:
+            player, enemy = 1, X
+        elif cell == X:
+            player, enemy = 2, O
+        else:
+            self.threatened[1].discard(index)
+            self.threatened[2].discard(index)
+            return
+        self.threatened[3 - player].discard(index)
+        cells = self.cells
+        for sight in self.sight:
+            seen = sight[index]
+            if seen >= 0 and cells[seen] == enemy:
+                self.threatened[player].add(index)
+                return
+        self.threatened[player].discard(index)
+
+    def cell_changed(self, coord: tuple[int, int], old: int, new: int) -> None:
+        index = coord[0] * self.width + coord[1]
+        old, new = int(old), int(new)
+        self.cells[index] = new
+        resighted = (old == BLANK) != (new == BLANK)
+        if resighted:
+            for direction, (dx, dy) in enumerate(MOVE_VECTORS):
+                # every cell that looked through or at this one now sees something else
+                ahead = index if new != BLANK else self.sight[direction][index]
+                behind = self.sight[direction ^ 1][index]
+                x, y = coord[0] - dx, coord[1] - dy
+                while 0 <= x < self.length and 0 <= y < self.width:
+                    other = x * self.width + y
+                    self.sight[direction][other] = ahead
+                    if other == behind:
+                        break
+                    x, y = x - dx, y - dy
+        self.refresh_threat(index)
+        pieces = (O, X)
+        if old in pieces or new in pieces or resighted:
+            for sight in self.sight:
+                if sight[index] >= 0:
+                    # the first non-blank cell on each side is the one that moves onto this cell
+                    self.refresh_threat(sight[index])
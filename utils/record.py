@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import struct
+from collections import Counter
+from dataclasses import fields
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+import numpy as np
+
+from .board import Board
+from .constants import POWERUPS, Cell
+from .engine import COORD_COUNTS, Action, ActionKind
+from .portal import Portal
+from .settings_data import SettingsData
+
+if TYPE_CHECKING:
+    from .game import Game
+
+MAGIC = b"DOTR"
+VERSION = 1
+SNAPSHOT_INTERVAL = 16
+# header: magic, version, snapshot interval, seed, then every SettingsData field. Actions and snapshots store each
+# coordinate as one byte, so only boards of at most MAX_SIDE a side can be recorded
+MAX_SIDE = 256
+HEADER = struct.Struct(f"<4sBHQ{len(fields(SettingsData))}H")
+ACTION_FRAME, SNAPSHOT_FRAME, END_FRAME = b"A", b"S", b"E"
+ACTION_KINDS = list(ActionKind)
+SNAPSHOT_HEADER = struct.Struct("<IBB4H5HI")
+RNG_STATE = struct.Struct("<625IBd")
+END = struct.Struct("<BI")
+HASH_COUNT = struct.Struct("<I")
+
+
+def encode_action(action: Action) -> bytes:
+    return bytes([ACTION_KINDS.index(action.kind)] + [value for coord in action.coords for value in coord])
+
+
+def decode_action(data: bytes, offset: int) -> tuple[Action, int]:
+    kind = ACTION_KINDS[data[offset]]
+    count = COORD_COUNTS[kind]
+    values = data[offset + 1:offset + 1 + 2 * count]
+    coords = tuple((values[i], values[i + 1]) for i in range(0, 2 * count, 2))
+    return Action(kind, coords), offset + 1 + 2 * count
+
+
+def encode_snapshot(game: Game) -> bytes:
+    board = game.board
+    inventory = [POWERUPS.index(powerup) for player in (1, 2) for powerup in game.inventory[player]]
+    portals = [value for portal in board.portals for coord in (portal.coord_1, portal.coord_2) for value in coord]
+    crumblies = [value for coord in sorted(board.crumblies) for value in coord]
+    # in the order they arrived, which is the order moves are listed in
+    pieces = [value for player in (1, 2) for coord in board.dot_coords[player] for value in coord]
+    version, internal_state, gauss = game.rng.getstate()
+    return b"".join([
+        SNAPSHOT_HEADER.pack(game.turn_number, game.turn, game.winner or 0, game.deletes[1], game.deletes[2],
+                             game.creates[1], game.creates[2], len(game.inventory[1]), len(game.inventory[2]),
+                             len(board.dot_coords[1]), len(board.dot_coords[2]), len(board.portals),
+                             len(board.crumblies)),
+        board.grid.tobytes(), bytes(inventory), bytes(pieces), bytes(portals), bytes(crumblies),
+        RNG_STATE.pack(*internal_state, gauss is not None, gauss or 0.0)])
+
+
+def restore_snapshot(game: Game, data: bytes, offset: int = 0) -> None:
+    (turn_number, turn, winner, deletes_1, deletes_2, creates_1, creates_2, held_1, held_2, pieces_1, pieces_2,
+     num_portals, num_crumblies) = SNAPSHOT_HEADER.unpack_from(data, offset)
+    offset += SNAPSHOT_HEADER.size
+    length, width = game.settings.length, game.settings.width
+    grid = np.frombuffer(data, dtype=np.uint8, count=length * width, offset=offset).reshape(length, width).copy()
+    offset += length * width
+    powerups = [POWERUPS[code] for code in data[offset:offset + held_1 + held_2]]
+    offset += held_1 + held_2
+    values = data[offset:offset + 2 * (pieces_1 + pieces_2)]
+    pieces = [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+    offset += 2 * (pieces_1 + pieces_2)
+    values = data[offset:offset + 4 * num_portals]
+    portals = [Portal((values[i], values[i + 1]), (values[i + 2], values[i + 3])) for i in range(0, len(values), 4)]
+    offset += 4 * num_portals
+    values = data[offset:offset + 2 * num_crumblies]
+    crumblies = {(values[i], values[i + 1]) for i in range(0, len(values), 2)}
+    offset += 2 * num_crumblies
+    *internal_state, has_gauss, gauss = RNG_STATE.unpack_from(data, offset)
+    game.board = Board(grid, crumblies, {(x, y) for x, y in np.argwhere(grid == Cell.POWERUP).tolist()},
+                       {(x, y) for x, y in np.argwhere(grid == Cell.BARRIER).tolist()}, portals)
+    game.board.dot_coords = {1: dict.fromkeys(pieces[:pieces_1]), 2: dict.fromkeys(pieces[pieces_1:])}
+    game.inventory = {1: powerups[:held_1], 2: powerups[held_1:]}
+    game.deletes, game.creates = {1: deletes_1, 2: deletes_2}, {1: creates_1, 2: creates_2}
+    game.turn, game.turn_number, game.winner = turn, turn_number, winner or None
+    game.rng.setstate((3, tuple(internal_state), gauss if has_gauss else None))
+    game.state_hash = game.compute_state_hash()
+    game.position_counts = Counter([game.hash])
+
+
+def encode_hashes(hashes: list[int]) -> bytes:
+    return HASH_COUNT.pack(len(hashes)) + struct.pack(f"<{len(hashes)}Q", *hashes)
+
+
+def decode_hashes(data: bytes, offset: int) -> tuple[list[int], int]:
+    (count,) = HASH_COUNT.unpack_from(data, offset)
+    offset += HASH_COUNT.size
+    return list(struct.unpack_from(f"<{count}Q", data, offset)), offset + 8 * count
+
+
+class GameWriter:
+    def __init__(self, path: Path, game: Game, snapshot_interval: int = SNAPSHOT_INTERVAL) -> None:
+        if max(game.settings.length, game.settings.width) > MAX_SIDE:
+            raise ValueError(f"Only boards of at most {MAX_SIDE}x{MAX_SIDE} can be recorded")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file: BinaryIO = path.open("wb")
+        self.snapshot_interval = snapshot_interval
+        # where each recorded action starts, so undone turns can be cut off again
+        self.offsets: list[int] = []
+        # the position after each action, and how many actions had been recorded at each snapshot. A snapshot
+        # stores the positions since the one before, so a replay can rebuild the repetition counts
+        self.hashes: list[int] = []
+        self.snapshot_counts: list[int] = [0]
+        settings = [getattr(game.settings, setting.name) for setting in fields(SettingsData)]
+        self.file.write(HEADER.pack(MAGIC, VERSION, snapshot_interval, game.seed, *settings))
+
+    def record(self, game: Game, action: Action) -> None:
+        self.offsets.append(self.file.tell())
+        self.hashes.append(game.hash)
+        self.file.write(ACTION_FRAME + encode_action(action))
+        if game.winner is not None:
+            self.file.write(END_FRAME + END.pack(game.winner, game.turn_number))
+        elif game.turn_number % self.snapshot_interval == 0:
+            snapshot = encode_snapshot(game)
+            self.file.write(SNAPSHOT_FRAME + struct.pack("<I", len(snapshot)) + snapshot
+                            + encode_hashes(self.hashes[self.snapshot_counts[-1]:]))
+            self.snapshot_counts.append(len(self.hashes))
+
+    def rewind(self, count: int) -> None:
+        self.file.seek(self.offsets[-count])
+        self.file.truncate()
+        del self.offsets[-count:]
+        del self.hashes[-count:]
+        while self.snapshot_counts[-1] > len(self.hashes):
+            self.snapshot_counts.pop()
+
+    def close(self) -> None:
+        self.file.close()
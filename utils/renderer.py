@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, TextIO
+
+import numpy as np
+
+from .constants import CELL_CHARS
+from .other_utils import index_to_letters
+
+if TYPE_CHECKING:
+    from .board import Board
+
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+CLEAR_BELOW = "\x1b[J"
+RESET_SCROLL_REGION = "\x1b[r"
+
+
+def move_cursor(line: int, column: int) -> str:
+    return f"\x1b[{line};{column}H"
+
+
+def scroll_region(top: int, bottom: int) -> str:
+    return f"\x1b[{top};{bottom}r"
+
+
+@dataclass
+class Renderer:
+    output: TextIO = sys.stdout
+    ansi: bool | None = None
+    # the fewest lines left under the frame for prompts. They scroll within those lines however much is
+    # printed, so the board stays where the incremental redraw expects it
+    prompt_lines: int = 12
+
+    def __post_init__(self) -> None:
+        if self.ansi is None:
+            self.ansi = self.output.isatty() and os.environ.get("TERM", "") != "dumb"
+        self.shown: np.ndarray | None = None
+
+    @staticmethod
+    def layout(board: Board) -> tuple[int, int]:
+        return len(index_to_letters(board.length - 1)), len(str(board.width))
+
+    def frame(self, board: Board, footer: tuple[str, ...]) -> str:
+        label_width, cell_width = self.layout(board)
+        lines = [index_to_letters(row).ljust(label_width)
+                 + "".join(f" {CELL_CHARS[cell]:>{cell_width}}" for cell in cells)
+                 for row, cells in enumerate(board.grid.tolist())]
+        lines += ["", " " * label_width + "".join(f" {column:0{cell_width}}" for column in range(1, board.width + 1))]
+        return "\n".join(lines + list(footer)) + "\n"
+
+    def diff(self, board: Board) -> str:
+        label_width, cell_width = self.layout(board)
+        return "".join(move_cursor(row + 1, label_width + column * (cell_width + 1) + cell_width + 1)
+                       + CELL_CHARS[board.grid[row, column]]
+                       for row, column in np.argwhere(board.grid != self.shown).tolist())
+
+    def fits(self, board: Board, footer: tuple[str, ...]) -> bool:
+        return shutil.get_terminal_size().lines >= board.length + 2 + len(footer) + self.prompt_lines
+
+    def draw(self, board: Board, *footer: str) -> None:
+        fits = self.ansi and self.fits(board, footer)
+        if not self.ansi:
+            text = "\n" + self.frame(board, footer)
+        elif not fits:
+            text = RESET_SCROLL_REGION + CLEAR_SCREEN + self.frame(board, footer)
+        else:
+            if self.shown is not None and self.shown.shape == board.grid.shape:
+                text = self.diff(board)
+            else:
+                text = RESET_SCROLL_REGION + CLEAR_SCREEN + self.frame(board, ())
+            # setting the region homes the cursor, so the footer is placed afterwards
+            footer_line = board.length + 3
+            text += (scroll_region(footer_line, shutil.get_terminal_size().lines) + move_cursor(footer_line, 1)
+                     + CLEAR_BELOW + "".join(line + "\n" for line in footer))
+        self.output.write(text)
+        self.output.flush()
+        self.shown = board.grid.copy() if fits else None
+
+    def close(self) -> None:
+        # hands the whole screen back, with the cursor under everything drawn
+        if self.shown is not None:
+            self.output.write(RESET_SCROLL_REGION + move_cursor(shutil.get_terminal_size().lines, 1) + "\n")
+            self.output.flush()
+            self.shown = None
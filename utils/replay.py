@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .engine import Action, apply, is_legal
+from .game import Game
+from .record import (ACTION_FRAME, END, END_FRAME, HEADER, MAGIC, SNAPSHOT_FRAME, VERSION,
+                     decode_action, decode_hashes, encode_snapshot, restore_snapshot)
+from .settings_data import SettingsData
+
+
+@dataclass
+class GameRecord:
+    settings: SettingsData
+    seed: int
+    actions: list[Action] = field(default_factory=list)
+    # turn number -> (offset, length) of the snapshot taken at the start of that turn
+    snapshots: dict[int, tuple[int, int]] = field(default_factory=dict)
+    # turn number -> the positions reached since the previous snapshot
+    repetitions: dict[int, list[int]] = field(default_factory=dict)
+    result: tuple[int, int] | None = None
+    data: bytes = b""
+
+    @staticmethod
+    def load(path: Path) -> GameRecord:
+        data = path.read_bytes()
+        magic, version, _, seed, *settings = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a Dotto game record this version can read")
+        record = GameRecord(SettingsData(*settings), seed, data=data)
+        offset = HEADER.size
+        while offset < len(data):
+            frame, offset = data[offset:offset + 1], offset + 1
+            if frame == ACTION_FRAME:
+                action, offset = decode_action(data, offset)
+                record.actions.append(action)
+            elif frame == SNAPSHOT_FRAME:
+                (size,) = struct.unpack_from("<I", data, offset)
+                record.snapshots[len(record.actions) + 1] = (offset + 4, size)
+                offset += 4 + size
+                record.repetitions[len(record.actions) + 1], offset = decode_hashes(data, offset)
+            elif frame == END_FRAME:
+                record.result = END.unpack_from(data, offset)
+                offset += END.size
+            else:
+                raise ValueError(f"Corrupt game record {path} at byte {offset - 1}")
+        return record
+
+    def replay(self, turn: int | None = None) -> Game:
+        # returns the game as it stood at the start of the given turn, or at the end
+        target = len(self.actions) if turn is None else min(turn - 1, len(self.actions))
+        game = Game(self.settings, seed=self.seed)
+        start = max((snapshot_turn for snapshot_turn in self.snapshots if snapshot_turn - 1 <= target), default=1)
+        if start > 1:
+            counts = game.position_counts
+            for snapshot_turn, hashes in self.repetitions.items():
+                if snapshot_turn <= start:
+                    counts.update(hashes)
+            offset, _ = self.snapshots[start]
+            restore_snapshot(game, self.data, offset)
+            game.position_counts = counts
+        for action in self.actions[start - 1:target]:
+            apply(game, action)
+        return game
+
+    def verify(self) -> list[str]:
+        problems = []
+        game = Game(self.settings, seed=self.seed)
+        for index, action in enumerate(self.actions, start=1):
+            if index in self.snapshots:
+                offset, size = self.snapshots[index]
+                if encode_snapshot(game) != self.data[offset:offset + size]:
+                    problems.append(f"Turn {index}: position differs from the recorded snapshot")
+            if not is_legal(game, action):
+                problems.append(f"Turn {index}: {action} is no longer legal")
+                return problems
+            apply(game, action)
+        if self.result is not None and (game.winner, game.turn_number) != self.result:
+            problems.append(f"Result differs: recorded {self.result}, replayed {(game.winner, game.turn_number)}")
+        return problems
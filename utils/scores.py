@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .constants import SCORES_DB_PATH, SCORES_PATH
+from .other_utils import import_2d
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    dots INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_board ON scores (length, width, dots, turns);
+"""
+SCHEMA_VERSION = 1
+
+
+@dataclass
+class ScoreStore:
+    path: Path = SCORES_DB_PATH
+    csv_path: Path | None = SCORES_PATH
+
+    def __post_init__(self) -> None:
+        # autocommit mode, so every insert is its own short write transaction
+        self.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA busy_timeout=30000")
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.connection.execute(statement)
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                if self.csv_path is not None and self.csv_path.exists():
+                    self.import_csv(self.csv_path)
+                self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def import_csv(self, csv_path: Path) -> int:
+        rows = [row for row in import_2d(csv_path) if len(row) == 5]
+        self.connection.executemany(
+            "INSERT INTO scores (name, length, width, dots, turns, created) VALUES (?, ?, ?, ?, ?, ?)",
+            [(name, int(length), int(width), int(dots), int(turns), 0.0) for name, length, width, dots, turns in rows])
+        return len(rows)
+
+    def add(self, name: str, length: int, width: int, dots: int, turns: int) -> None:
+        self.connection.execute(
+            "INSERT INTO scores (name, length, width, dots, turns, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, length, width, dots, turns, time.time()))
+
+    def top(self, length: int, width: int, dots: int, k: int = 10) -> list[tuple[str, int, int, int, int]]:
+        return self.connection.execute(
+            "SELECT name, length, width, dots, turns FROM scores WHERE length = ? AND width = ? AND dots = ? "
+            "ORDER BY turns, id LIMIT ?", (length, width, dots, k)).fetchall()
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
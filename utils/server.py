@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .engine import apply, is_legal, parse_action
+from .game import Game
+from .other_utils import coord_to_string
+from .protocol import WIRE_CHARS, board_line, legal_line, parse_settings, start_game, state_lines
+
+SEND_QUEUE_LIMIT = 256
+
+
+@dataclass(eq=False)
+class Client:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    queue: asyncio.Queue[str] = field(default_factory=lambda: asyncio.Queue(SEND_QUEUE_LIMIT))
+    match: Match | None = None
+    seat: int = 0
+    dropped: bool = False
+
+    def send(self, line: str) -> None:
+        # a client that cannot keep up is dropped rather than allowed to stall its match
+        try:
+            self.queue.put_nowait(line + "\n")
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.writer.transport.abort()
+
+    async def pump(self) -> None:
+        while True:
+            self.writer.write((await self.queue.get()).encode())
+            await self.writer.drain()
+
+
+@dataclass(eq=False)
+class Match:
+    id: int
+    game: Game
+    clients: dict[int, Client] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.sent_grid = self.game.board.grid.copy()
+
+    def broadcast(self, line: str) -> None:
+        for client in self.clients.values():
+            client.send(line)
+
+    def diff_line(self) -> str:
+        grid = self.game.board.grid
+        changed = np.argwhere(grid != self.sent_grid).tolist()
+        self.sent_grid = grid.copy()
+        return "diff " + " ".join(f"{coord_to_string((x, y))}={WIRE_CHARS[grid[x, y]]}" for x, y in changed)
+
+
+@dataclass
+class DottoServer:
+    host: str = "127.0.0.1"
+    port: int = 8765
+    matches: dict[int, Match] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.match_ids = itertools.count(1)
+        self.waiting: list[Match] = []
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self.handle, self.host, self.port, limit=4096)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = Client(reader, writer)
+        pump = asyncio.create_task(client.pump())
+        client.send("hello dotto 1")
+        try:
+            while not reader.at_eof() and not client.dropped:
+                line = (await reader.readline()).decode(errors="replace").strip()
+                # readline does not yield while input is buffered, so a flooding client would hog the loop
+                await asyncio.sleep(0)
+                if not line:
+                    continue
+                command, _, argument = line.partition(" ")
+                if command == "quit":
+                    break
+                try:
+                    self.dispatch(client, command, argument)
+                except ValueError as error:
+                    client.send(f"error {error}")
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.leave(client)
+            pump.cancel()
+            while not client.queue.empty():
+                writer.write(client.queue.get_nowait().encode())
+            writer.close()
+
+    def dispatch(self, client: Client, command: str, argument: str) -> None:
+        if command == "new":
+            self.join(client, self.create_match(argument))
+        elif command == "join":
+            match = self.matches.get(int(argument)) if argument.isdigit() else None
+            if match is None or len(match.clients) == 2:
+                raise ValueError("No open match with that id")
+            self.join(client, match)
+        elif command == "play":
+            self.join(client, self.waiting[0] if self.waiting else self.create_match(argument))
+        elif client.match is None:
+            raise ValueError("Not in a match")
+        elif command == "board":
+            client.send(board_line(client.match.game))
+        elif command == "legal":
+            client.send(legal_line(client.match.game))
+        elif command == "action":
+            self.act(client, argument)
+        else:
+            raise ValueError(f"Unknown command '{command}'")
+
+    def create_match(self, argument: str) -> Match:
+        match = Match(next(self.match_ids), start_game(parse_settings(argument.split())))
+        self.matches[match.id] = match
+        self.waiting.append(match)
+        return match
+
+    def join(self, client: Client, match: Match) -> None:
+        if client.match is not None:
+            raise ValueError("Already in a match")
+        client.match, client.seat = match, 1 if 1 not in match.clients else 2
+        match.clients[client.seat] = client
+        client.send(f"match {match.id} seat {client.seat}")
+        if len(match.clients) == 2:
+            self.waiting.remove(match)
+            match.broadcast(board_line(match.game))
+            for line in state_lines(match.game):
+                match.broadcast(line)
+
+    def act(self, client: Client, argument: str) -> None:
+        match = client.match
+        game = match.game
+        if len(match.clients) < 2:
+            raise ValueError("Waiting for an opponent")
+        if game.winner is not None or game.turn != client.seat:
+            raise ValueError("Not your turn")
+        action = parse_action(argument)
+        if not is_legal(game, action):
+            raise ValueError(f"Illegal action {action}")
+        apply(game, action)
+        match.broadcast(f"played {client.seat} {action}")
+        match.broadcast(match.diff_line())
+        for line in state_lines(match.game):
+            match.broadcast(line)
+        if game.winner is not None:
+            self.matches.pop(match.id, None)
+
+    def leave(self, client: Client) -> None:
+        match = client.match
+        if match is None:
+            return
+        del match.clients[client.seat]
+        if match in self.waiting:
+            self.waiting.remove(match)
+        if match.game.winner is None and match.clients:
+            match.game.winner = 3 - client.seat
+            match.broadcast(f"winner {match.game.winner} {match.game.turn_number}")
+        if not match.clients:
+            self.matches.pop(match.id, None)
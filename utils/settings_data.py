@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from .validation_utils import get_valid_int
 from .constants import TRIANGLE_NUMBERS, BARRIER_DENSITY_TRANS
 
@@ -15,8 +15,14 @@ class SettingsData:
     num_deletes: int = 3
     num_creates: int = 3
 
+    def barriers_fit(self) -> bool:
+        # imported here, the board module builds on these settings
+        from .board import barriers_fit
+        return barriers_fit(self.length, self.width, self.num_dots, self.barrier_density)
+
     def edit(self) -> None:
         while True:
+            previous = asdict(self)
             option = get_valid_int("What would you like to do?\n1) Set Length\n2) Set Width\n3) Set Amount of Dots\n"
                                    "4) Set Amount of Start Powerups\n5) Set Frequency of Powerup Placement\n"
                                    "6) Change Number of Crumblies\n7) Set Barrier Density\n8) Set Number of Deletes\n9) Set Number of Creates\n10) Exit\n", 1, 10)
@@ -43,6 +49,16 @@ class SettingsData:
                 self.num_creates = get_valid_int("Enter your preffered number of creates each player gets.", 0)
             elif option == 10:
                 break
+            try:
+                fits = self.barriers_fit()
+            except ValueError as error:
+                print(error)
+                fits = False
+            if not fits:
+                print(f"{BARRIER_DENSITY_TRANS[self.barrier_density]} barriers cannot fit on a {self.length}x{self.width} "
+                      f"board with {self.num_dots} dots, keeping the previous settings")
+                for name, value in previous.items():
+                    setattr(self, name, value)
 
     def __repr__(self) -> str:
         return (f"Settings:\n"
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import multiprocessing
+import random
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from .batch import BatchGame
+from .engine import apply
+from .game import Game
+from .metrics import Metrics
+from .policies import POLICIES
+from .record import GameWriter
+from .settings_data import SettingsData
+
+
+BATCH_POLICIES = {"random", "greedy"}
+# the batched engine only plays moves, so its players are reported apart from the full policies
+BATCH_SUFFIX = "-moves"
+
+
+@dataclass
+class GameSummary:
+    index: int
+    winner: int | None
+    turns: int
+    generation_failed: bool = False
+    metrics: Metrics | None = None
+
+
+def game_seed(seed: int, index: int, *purpose: str) -> int:
+    return random.Random(":".join([str(seed), str(index), *purpose])).getrandbits(64)
+
+
+def play_game(settings: SettingsData, policy_names: tuple[str, str], seed: int,
+              index: int, max_turns: int, record_dir: Path | None = None,
+              instrument: bool = False) -> GameSummary:
+    metrics = Metrics() if instrument else None
+    try:
+        game = Game(settings, seed=game_seed(seed, index), metrics=metrics)
+    except ValueError:
+        return GameSummary(index, None, 0, generation_failed=True, metrics=metrics)
+    policies = {player: POLICIES[name](random.Random(game_seed(seed, index, "policy", str(player))))
+                for player, name in zip((1, 2), policy_names)}
+    writer = None if record_dir is None else GameWriter(record_dir / f"{seed}-{index:06d}.dotr", game)
+    while game.winner is None and game.turn_number <= max_turns:
+        action = policies[game.turn](game)
+        apply(game, action)
+        if writer is not None:
+            writer.record(game, action)
+    if writer is not None:
+        writer.close()
+    return GameSummary(index, game.winner, game.turn_number, metrics=metrics)
+
+
+def run_game(arguments: tuple[SettingsData, tuple[str, str], int, int, int, Path | None, bool]) -> GameSummary:
+    return play_game(*arguments)
+
+
+def simulate(settings: SettingsData, policy_names: tuple[str, str], num_games: int,
+             seed: int = 0, workers: int = 1, max_turns: int = 500,
+             record_dir: Path | None = None, instrument: bool = False) -> list[GameSummary]:
+    tasks = [(settings, policy_names, seed, index, max_turns, record_dir, instrument) for index in range(num_games)]
+    if workers == 1:
+        return [run_game(task) for task in tasks]
+    with multiprocessing.Pool(workers) as pool:
+        summaries = list(pool.imap_unordered(run_game, tasks, chunksize=max(1, num_games // (workers * 16))))
+    return sorted(summaries, key=lambda summary: summary.index)
+
+
+@dataclass
+class SimulationReport:
+    policies: tuple[str, str]
+    games: int
+    elapsed: float
+    wins: dict[str, int]
+    turns: dict[str, float]
+    turn_histogram: dict[str, int]
+    generation_failures: int
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    @staticmethod
+    def from_summaries(summaries: list[GameSummary], elapsed: float, policies: tuple[str, str],
+                       bucket: int = 10) -> SimulationReport:
+        played = [summary for summary in summaries if not summary.generation_failed]
+        winners = Counter(summary.winner for summary in played)
+        turns = sorted(summary.turns for summary in played)
+        histogram = Counter((turn // bucket) * bucket for turn in turns)
+        return SimulationReport(
+            policies=policies,
+            games=len(summaries),
+            elapsed=elapsed,
+            wins={"player_1": winners[1], "player_2": winners[2], "unfinished": winners[None]},
+            turns={"min": turns[0], "mean": statistics.fmean(turns), "median": statistics.median(turns),
+                   "p90": turns[int(0.9 * (len(turns) - 1))], "max": turns[-1]} if turns else {},
+            turn_histogram={f"{start}-{start + bucket - 1}": histogram[start] for start in sorted(histogram)},
+            generation_failures=len(summaries) - len(played))
+
+    def __str__(self) -> str:
+        lines = [f"Policies: {self.policies[0]} vs {self.policies[1]}",
+                 f"Games: {self.games} in {self.elapsed:.2f}s ({self.games_per_second:,.1f} games/s)"]
+        for side, count in self.wins.items():
+            lines.append(f"{side}: {count} ({count / self.games:.1%})" if self.games else f"{side}: 0")
+        lines.append("Turns: " + ", ".join(f"{key} {value:g}" for key, value in self.turns.items()))
+        for turn_range, count in self.turn_histogram.items():
+            lines.append(f"  {turn_range}\t{count}")
+        lines.append(f"Boards that could not be generated: {self.generation_failures}")
+        return "\n".join(lines)
+
+
+def simulate_batch(settings: SettingsData, policy_names: tuple[str, str], num_games: int,
+                   seed: int = 0, max_turns: int = 500) -> list[GameSummary]:
+    # every game at once on the vectorized engine, which only plays moves, so only the move-picking policies fit
+    if not set(policy_names) <= BATCH_POLICIES:
+        raise ValueError(f"Batched games can only be played by the {' and '.join(sorted(BATCH_POLICIES))} policies")
+    summaries, games = [], []
+    for index in range(num_games):
+        try:
+            games.append(Game(settings, seed=game_seed(seed, index)))
+        except ValueError:
+            summaries.append(GameSummary(index, None, 0, generation_failed=True))
+            continue
+        summaries.append(GameSummary(index, None, 0))
+    if games:
+        batch = BatchGame.from_games(games, game_seed(seed, 0, "batch"))
+        batch.playout(max_turns, tuple(name == "greedy" for name in policy_names))
+        played = [summary for summary in summaries if not summary.generation_failed]
+        for summary, winner, turns in zip(played, batch.winner.tolist(), batch.turn_number.tolist()):
+            summary.winner, summary.turns = winner or None, turns
+    return summaries
+
+
+def run_simulation(settings: SettingsData, policy_names: tuple[str, str], num_games: int,
+                   seed: int = 0, workers: int = 1, max_turns: int = 500,
+                   record_dir: Path | None = None, metrics: Metrics | None = None,
+                   batch: bool = False) -> SimulationReport:
+    start = time.perf_counter()
+    if batch:
+        if record_dir is not None or metrics is not None:
+            raise ValueError("Batched games cannot be recorded or instrumented")
+        summaries = simulate_batch(settings, policy_names, num_games, seed, max_turns)
+        policy_names = tuple(name + BATCH_SUFFIX for name in policy_names)
+    else:
+        summaries = simulate(settings, policy_names, num_games, seed, workers, max_turns, record_dir,
+                             metrics is not None)
+    if metrics is not None:
+        for summary in summaries:
+            if summary.metrics is not None:
+                metrics.merge(summary.metrics)
+    return SimulationReport.from_summaries(summaries, time.perf_counter() - start, policy_names)
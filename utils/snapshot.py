@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from .board import Board
+from .engine import Action
+from .portal import Portal
+
+if TYPE_CHECKING:
+    from .game import Game
+
+
+def share(previous: Any, current: Any) -> Any:
+    # the previous version's object when nothing changed, so unchanged parts are held once across versions
+    return previous if previous == current else current
+
+
+def pack_rng_state(state: tuple) -> tuple[int, bytes, float | None]:
+    # the generator's 625 words as one bytes object rather than 625 int objects
+    version, internal_state, gauss = state
+    return version, array("I", internal_state).tobytes(), gauss
+
+
+def unpack_rng_state(state: tuple[int, bytes, float | None]) -> tuple:
+    version, internal_state, gauss = state
+    return version, tuple(array("I", internal_state)), gauss
+
+
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    # an immutable position; each version shares every row and collection that did not change with its parent
+    rows: tuple[bytes, ...]
+    crumblies: frozenset[tuple[int, int]]
+    powerups: frozenset[tuple[int, int]]
+    barriers: frozenset[tuple[int, int]]
+    portals: tuple[Portal, ...]
+    dot_coords: tuple[tuple[tuple[int, int], ...], tuple[tuple[int, int], ...]]
+    inventory: tuple[tuple[str, ...], tuple[str, ...]]
+    counts: tuple[int, int, int, int]
+    turn: int
+    turn_number: int
+    winner: int | None
+    rng_state: tuple[int, bytes, float | None]
+    hash: int
+    # the position before action, or None for a root, which keeps the repetition counts itself
+    parent: Snapshot | None = None
+    action: Action | None = None
+    root_counts: tuple[tuple[int, int], ...] = ()
+
+    @staticmethod
+    def take(game: Game, parent: Snapshot | None = None, action: Action | None = None) -> Snapshot:
+        board = game.board
+        rows = tuple(row.tobytes() for row in board.grid)
+        pieces = (tuple(board.dot_coords[1]), tuple(board.dot_coords[2]))
+        inventory = (tuple(game.inventory[1]), tuple(game.inventory[2]))
+        counts = (game.deletes[1], game.deletes[2], game.creates[1], game.creates[2])
+        rng_state = pack_rng_state(game.rng.getstate())
+        crumblies, powerups, barriers = frozenset(board.crumblies), frozenset(board.powerups), frozenset(board.barriers)
+        portals = tuple(board.portals)
+        if parent is not None:
+            rows = tuple(map(share, parent.rows, rows))
+            crumblies, powerups = share(parent.crumblies, crumblies), share(parent.powerups, powerups)
+            barriers, portals = share(parent.barriers, barriers), share(parent.portals, portals)
+            pieces = tuple(map(share, parent.dot_coords, pieces))
+            inventory = tuple(map(share, parent.inventory, inventory))
+            counts, rng_state = share(parent.counts, counts), share(parent.rng_state, rng_state)
+        root_counts = () if parent is not None else tuple(game.position_counts.items())
+        return Snapshot(rows, crumblies, powerups, barriers, portals, pieces, inventory, counts, game.turn,
+                        game.turn_number, game.winner, rng_state, game.hash, parent, action, root_counts)
+
+    def position_counts(self) -> Counter[int]:
+        chain = []
+        snapshot = self
+        while snapshot.parent is not None:
+            chain.append(snapshot.hash)
+            snapshot = snapshot.parent
+        counts = Counter(dict(snapshot.root_counts))
+        counts.update(chain)
+        return counts
+
+    def restore(self, game: Game) -> None:
+        width = len(self.rows[0])
+        grid = np.frombuffer(b"".join(self.rows), dtype=np.uint8).reshape(len(self.rows), width).copy()
+        game.board = Board(grid, set(self.crumblies), set(self.powerups), set(self.barriers), list(self.portals))
+        # the scan in Board keeps board order, but move order follows the order pieces arrived in
+        game.board.dot_coords = {1: dict.fromkeys(self.dot_coords[0]), 2: dict.fromkeys(self.dot_coords[1])}
+        game.inventory = {1: list(self.inventory[0]), 2: list(self.inventory[1])}
+        deletes_1, deletes_2, creates_1, creates_2 = self.counts
+        game.deletes, game.creates = {1: deletes_1, 2: deletes_2}, {1: creates_1, 2: creates_2}
+        game.turn, game.turn_number, game.winner = self.turn, self.turn_number, self.winner
+        game.rng.setstate(unpack_rng_state(self.rng_state))
+        game.state_hash = game.compute_state_hash()
+        game.position_counts = self.position_counts()
+
+
+@dataclass
+class History:
+    current: Snapshot
+    future: list[Snapshot] = field(default_factory=list)
+
+    def push(self, game: Game, action: Action) -> None:
+        self.current = Snapshot.take(game, self.current, action)
+        self.future.clear()
+
+    def undo(self, game: Game, stop: Callable[[Snapshot], bool] = lambda snapshot: True) -> list[Snapshot]:
+        # steps back until stop accepts the position, returns the positions left, latest first
+        undone = []
+        while self.current.parent is not None:
+            undone.append(self.current)
+            self.current = self.current.parent
+            if stop(self.current):
+                break
+        self.future += undone
+        if undone:
+            self.current.restore(game)
+        return undone
+
+    def redo(self, game: Game, stop: Callable[[Snapshot], bool] = lambda snapshot: True) -> list[Snapshot]:
+        redone = []
+        while self.future:
+            self.current = self.future.pop()
+            redone.append(self.current)
+            if stop(self.current):
+                break
+        if redone:
+            self.current.restore(game)
+        return redone
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import hashlib
+from collections import deque
+from dataclasses import dataclass
+from functools import cache
+from itertools import combinations
+from math import comb
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from .constants import MOVE_VECTORS, TABLEBASE_PATH, Cell
+from .engine import Action, ActionKind, legal_actions
+
+if TYPE_CHECKING:
+    from .board import Board
+    from .game import Game
+
+REGULAR, BARRIER, BLANK = 0, 1, 2
+SOLVED_CELLS = {Cell.REGULAR, Cell.BARRIER, Cell.BLANK, Cell.O, Cell.X}
+MAX_PIECES = 3
+# the largest board side that tables are built for on demand
+TABLEBASE_MAX_SIZE = 6
+
+
+def board_terrain(board: Board) -> np.ndarray:
+    # everything that is neither a barrier nor a blank is somewhere a piece can stand
+    grid = board.grid
+    return np.where(grid == Cell.BARRIER, BARRIER, np.where(grid == Cell.BLANK, BLANK, REGULAR)).astype(np.int8)
+
+
+def terrain_of(game: Game) -> np.ndarray | None:
+    # only the move-only endgame is solved: nothing left to pick up, place, spend or collapse
+    if game.board.crumblies or any(game.inventory[player] or game.deletes[player] or game.creates[player]
+                                   for player in (1, 2)):
+        return None
+    if not set(game.board.grid.ravel().tolist()) <= SOLVED_CELLS:
+        return None
+    return board_terrain(game.board)
+
+
+def symmetries(length: int, width: int) -> list[Callable[[np.ndarray], np.ndarray]]:
+    flips = [lambda a: a, lambda a: a[::-1], lambda a: a[:, ::-1], lambda a: a[::-1, ::-1]]
+    if length != width:
+        return flips
+    return flips + [lambda a, flip=flip: flip(a.T) for flip in flips]
+
+
+def canonical(terrain: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # the smallest of the terrain's symmetric images, and where each original cell lands in it
+    cells = np.arange(terrain.size).reshape(terrain.shape)
+    images = [(symmetry(terrain), symmetry(cells)) for symmetry in symmetries(*terrain.shape)]
+    image, moved = min(images, key=lambda pair: pair[0].tobytes())
+    placement = np.empty(terrain.size, dtype=np.int64)
+    placement[moved.ravel()] = np.arange(terrain.size)
+    return np.ascontiguousarray(image), placement
+
+
+def table_path(terrain: np.ndarray, max_pieces: int, directory: Path = TABLEBASE_PATH) -> Path:
+    key = hashlib.blake2b(terrain.tobytes(), digest_size=8).hexdigest()
+    return directory / f"{terrain.shape[0]}x{terrain.shape[1]}-{key}-{max_pieces}.npy"
+
+
+def materials(max_pieces: int) -> list[tuple[int, int]]:
+    # pieces of the side to move, pieces of the other side
+    return [(movers, total - movers) for total in range(2, max_pieces + 1) for movers in range(1, total)]
+
+
+def rank(ranks: list[int]) -> int:
+    # combinatorial number system: a minimal perfect hash of a sorted k-subset
+    return sum(comb(value, i + 1) for i, value in enumerate(ranks))
+
+
+@dataclass
+class Tablebase:
+    # values[i] > 0: the side to move wins in that many plies, < 0: loses in that many, 0: a draw
+    terrain: np.ndarray
+    max_pieces: int
+    values: np.ndarray
+
+    def __post_init__(self) -> None:
+        self.free = np.flatnonzero(self.terrain.ravel() == REGULAR).tolist()
+        self.free_rank = {cell: i for i, cell in enumerate(self.free)}
+        # the symmetries that leave the terrain as it is, as maps from each cell to where it goes, identity first
+        cells = np.arange(self.terrain.size).reshape(self.terrain.shape)
+        self.automorphisms = []
+        for symmetry in symmetries(*self.terrain.shape):
+            if np.array_equal(symmetry(self.terrain), self.terrain):
+                target = np.empty(self.terrain.size, dtype=np.int64)
+                target[symmetry(cells).ravel()] = np.arange(self.terrain.size)
+                self.automorphisms.append(target.tolist())
+        # only placements of the side to move that no automorphism ranks lower are stored
+        self.mover_ids: dict[int, list[int]] = {}
+        self.offsets = {}
+        offset = 0
+        for movers, others in materials(self.max_pieces):
+            if movers not in self.mover_ids:
+                self.mover_ids[movers] = ids = [-1] * comb(len(self.free), movers)
+                canonical_sets = [placed for placed in combinations(self.free, movers)
+                                  if self.mover_rank(placed) == min(map(self.mover_rank, self.images(placed)))]
+                for i, placed in enumerate(canonical_sets):
+                    ids[self.mover_rank(placed)] = i
+            self.offsets[movers, others] = offset
+            offset += self.material_size(movers, others)
+        self.size = offset
+
+    def images(self, cells: tuple[int, ...]) -> list[tuple[int, ...]]:
+        return [tuple(automorphism[cell] for cell in cells) for automorphism in self.automorphisms]
+
+    def mover_rank(self, movers: tuple[int, ...]) -> int:
+        return rank(sorted(self.free_rank[cell] for cell in movers))
+
+    def material_size(self, movers: int, others: int) -> int:
+        return (len(self.mover_ids[movers]) - self.mover_ids[movers].count(-1)) * comb(len(self.free) - movers, others)
+
+    def canonical_movers(self, movers: int) -> list[tuple[int, ...]]:
+        ids = self.mover_ids[movers]
+        return [cells for cells in combinations(self.free, movers) if ids[self.mover_rank(cells)] >= 0]
+
+    def index(self, movers: tuple[int, ...], others: tuple[int, ...]) -> int:
+        # cells are flat indices into the canonical terrain, turned so the side to move's placement is stored
+        if len(self.automorphisms) > 1:
+            ranks = [self.mover_rank(image) for image in self.images(movers)]
+            automorphism = self.automorphisms[ranks.index(min(ranks))]
+            movers = tuple(automorphism[cell] for cell in movers)
+            others = tuple(automorphism[cell] for cell in others)
+        mover_ranks = sorted(self.free_rank[cell] for cell in movers)
+        # the other side's cells are ranked among the cells the movers left free
+        other_ranks = [value - sum(taken < value for taken in mover_ranks)
+                       for value in sorted(self.free_rank[cell] for cell in others)]
+        free_after = len(self.free) - len(movers)
+        return (self.offsets[len(movers), len(others)]
+                + self.mover_ids[len(movers)][rank(mover_ranks)] * comb(free_after, len(others)) + rank(other_ranks))
+
+    def probe(self, movers: tuple[int, ...], others: tuple[int, ...]) -> int:
+        return int(self.values[self.index(movers, others)])
+
+    @staticmethod
+    def landings(terrain: np.ndarray) -> list[list[int]]:
+        # where a piece on each cell stops along each direction, or -1, the same slide as Game.calculate_move
+        length, width = terrain.shape
+        flat = terrain.ravel().tolist()
+        landings = []
+        for dx, dy in MOVE_VECTORS:
+            row = []
+            for cell in range(terrain.size):
+                x, y = divmod(cell, width)
+                x, y = x + dx, y + dy
+                while 0 <= x < length and 0 <= y < width and flat[x * width + y] == BLANK:
+                    x, y = x + dx, y + dy
+                inside = 0 <= x < length and 0 <= y < width and flat[x * width + y] == REGULAR
+                row.append(x * width + y if inside else -1)
+            landings.append(row)
+        return landings
+
+    @staticmethod
+    def build(terrain: np.ndarray, max_pieces: int = MAX_PIECES) -> Tablebase:
+        table = Tablebase(terrain, max_pieces, np.zeros(0, dtype=np.int16))
+        landings = Tablebase.landings(terrain)
+        values = np.zeros(table.size, dtype=np.int16)
+        remaining = np.zeros(table.size, dtype=np.int32)
+        predecessors: list[list[int]] = [[] for _ in range(table.size)]
+        solved = deque()
+        for movers_count, others_count in materials(max_pieces):
+            for movers in table.canonical_movers(movers_count):
+                rest = [cell for cell in table.free if cell not in movers]
+                for others in combinations(rest, others_count):
+                    state = table.index(movers, others)
+                    successors = set()
+                    wins = False
+                    for piece in movers:
+                        for landing in landings:
+                            destination = landing[piece]
+                            if destination < 0 or destination in movers:
+                                continue
+                            if destination in others and others_count == 1:
+                                wins = True
+                                continue
+                            moved = tuple(cell for cell in movers if cell != piece) + (destination,)
+                            left = tuple(cell for cell in others if cell != destination)
+                            successors.add(table.index(left, moved))
+                    for successor in successors:
+                        predecessors[successor].append(state)
+                    remaining[state] = len(successors)
+                    if wins or not successors:
+                        # taking the last piece wins, having no move leaves only conceding
+                        values[state] = 1 if wins else -1
+                        solved.append(state)
+        # a position is won once any successor is lost, and lost once every successor is won
+        while solved:
+            state = solved.popleft()
+            value = int(values[state])
+            for predecessor in predecessors[state]:
+                if values[predecessor]:
+                    continue
+                if value < 0:
+                    values[predecessor] = 1 - value
+                    solved.append(predecessor)
+                else:
+                    remaining[predecessor] -= 1
+                    if remaining[predecessor] == 0:
+                        values[predecessor] = -1 - value
+                        solved.append(predecessor)
+        table.values = values
+        return table
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self.values)
+
+    @staticmethod
+    def load(path: Path, terrain: np.ndarray, max_pieces: int) -> Tablebase:
+        return Tablebase(terrain, max_pieces, np.load(path, mmap_mode="r"))
+
+
+@cache
+def open_table(path: Path, terrain_bytes: bytes, shape: tuple[int, int], max_pieces: int) -> Tablebase | None:
+    if not path.exists():
+        return None
+    return Tablebase.load(path, np.frombuffer(terrain_bytes, dtype=np.int8).reshape(shape), max_pieces)
+
+
+def build_table(terrain: np.ndarray, max_pieces: int = MAX_PIECES,
+                directory: Path = TABLEBASE_PATH) -> tuple[Path, Tablebase]:
+    image, _ = canonical(terrain)
+    path = table_path(image, max_pieces, directory)
+    table = Tablebase.build(image, max_pieces)
+    table.save(path)
+    open_table.cache_clear()
+    return path, table
+
+
+def locate(game: Game, build: bool = False, max_pieces: int = MAX_PIECES,
+           directory: Path = TABLEBASE_PATH) -> tuple[Tablebase, Callable[[tuple[int, int]], int]] | None:
+    # the game's table, and a map from board coords to cells of its canonical terrain
+    terrain = terrain_of(game)
+    if terrain is None or game.board.piece_count(1) + game.board.piece_count(2) > max_pieces:
+        return None
+    image, placement = canonical(terrain)
+    path = table_path(image, max_pieces, directory)
+    table = open_table(path, image.tobytes(), image.shape, max_pieces)
+    if table is None:
+        if not build:
+            return None
+        build_table(image, max_pieces, directory)
+        table = open_table(path, image.tobytes(), image.shape, max_pieces)
+    width = game.board.width
+    return table, lambda coord: int(placement[coord[0] * width + coord[1]])
+
+
+def probe(game: Game, build: bool = False, max_pieces: int = MAX_PIECES) -> int | None:
+    found = None if game.winner is not None else locate(game, build, max_pieces)
+    if found is None:
+        return None
+    table, cell = found
+    return table.probe(tuple(map(cell, game.board.dot_coords[game.turn])),
+                       tuple(map(cell, game.board.dot_coords[3 - game.turn])))
+
+
+def best_action(game: Game, build: bool = False, max_pieces: int = MAX_PIECES) -> tuple[Action, int] | None:
+    # the move that wins fastest, else draws, else loses slowest, with the value of the position
+    found = None if game.winner is not None else locate(game, build, max_pieces)
+    if found is None:
+        return None
+    table, cell = found
+    movers = tuple(map(cell, game.board.dot_coords[game.turn]))
+    others = tuple(map(cell, game.board.dot_coords[3 - game.turn]))
+    best, best_key = Action(ActionKind.CONCEDE), (0, 0)
+    for action in legal_actions(game):
+        if action.kind is not ActionKind.MOVE:
+            continue
+        origin, destination = cell(action.origin), cell(action.destination)
+        if others == (destination,):
+            key = (4, 0)
+        else:
+            # successors are read straight from the table, a powerup spawn would take them out of it
+            after = table.probe(tuple(other for other in others if other != destination),
+                                tuple(mover for mover in movers if mover != origin) + (destination,))
+            key = (3, after) if after < 0 else (2, 0) if after == 0 else (1, after)
+        if key > best_key:
+            best, best_key = action, key
+    return best, table.probe(movers, others)
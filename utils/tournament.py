@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import json
+import math
+import multiprocessing
+import os
+import random
+import shlex
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from itertools import combinations, product
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from .engine import Action, apply, is_legal, parse_action
+from .game import Game
+from .policies import POLICIES
+from .settings_data import SettingsData
+from .simulation import game_seed
+
+ELO_SCALE = 400 / math.log(10)
+Z_95 = 1.96
+# engine processes are started once per worker and reused for every game that worker plays
+ENGINES: dict[str, subprocess.Popen] = {}
+
+
+@dataclass(frozen=True)
+class Entrant:
+    name: str
+    policy: str | None = None
+    command: str | None = None
+    movetime: int = 100
+
+    @staticmethod
+    def parse(spec: str, movetime: int = 100) -> Entrant:
+        # "greedy", "old=alphabeta" or "new=engine:python ../dotto/main.py --protocol"
+        name, _, source = spec.partition("=")
+        source = source or name
+        if source.startswith("engine:"):
+            return Entrant(name, command=source[len("engine:"):], movetime=movetime)
+        if source not in POLICIES:
+            raise ValueError(f"Unknown player '{source}', expected one of {', '.join(POLICIES)} or engine:<command>")
+        return Entrant(name, policy=source)
+
+
+@dataclass(frozen=True)
+class Fixture:
+    round: int
+    config: int
+    players: tuple[Entrant, Entrant]
+    seed: int
+
+    @property
+    def id(self) -> str:
+        return f"r{self.round}-c{self.config}-{self.players[0].name}-{self.players[1].name}"
+
+
+@dataclass
+class Result:
+    id: str
+    round: int
+    config: int
+    players: tuple[str, str]
+    winner: int | None
+    turns: int
+    forfeit: bool = False
+    generation_failed: bool = False
+
+    def score(self, name: str) -> float:
+        # unfinished games count as draws
+        seat = self.players.index(name) + 1
+        return 0.5 if self.winner is None else float(self.winner == seat)
+
+
+class EngineError(Exception):
+    pass
+
+
+def engine_process(command: str) -> subprocess.Popen:
+    process = ENGINES.get(command)
+    if process is None or process.poll() is not None:
+        process = ENGINES[command] = subprocess.Popen(shlex.split(command), text=True, bufsize=1,
+                                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    return process
+
+
+def engine_exchange(process: subprocess.Popen, lines: list[str], until: str) -> str:
+    process.stdin.write("".join(line + "\n" for line in lines))
+    process.stdin.flush()
+    while line := process.stdout.readline():
+        if line.startswith("error"):
+            raise EngineError(line.strip())
+        if line.startswith(until):
+            return line.strip()
+    raise EngineError("engine exited")
+
+
+def engine_player(entrant: Entrant, game: Game, history: list[Action]) -> Callable[[Game], Action]:
+    process = engine_process(entrant.command)
+    settings = " ".join(f"{name}={value}" for name, value in asdict(game.settings).items())
+    engine_exchange(process, [f"newgame seed={game.seed} {settings}", "isready"], "readyok")
+
+    def choose(game: Game) -> Action:
+        reply = engine_exchange(process, ["position actions " + ";".join(str(action) for action in history),
+                                          f"go movetime {entrant.movetime}"], "bestaction")
+        action = parse_action(reply.removeprefix("bestaction"))
+        # apply trusts its action, so a well-formed but illegal one would corrupt the game rather than fail
+        if not is_legal(game, action):
+            raise EngineError(f"illegal action {action}")
+        return action
+    return choose
+
+
+def play_fixture(fixture: Fixture, settings: SettingsData, max_turns: int) -> Result:
+    names = (fixture.players[0].name, fixture.players[1].name)
+    try:
+        game = Game(settings, seed=fixture.seed)
+    except ValueError:
+        return Result(fixture.id, fixture.round, fixture.config, names, None, 0, generation_failed=True)
+    history: list[Action] = []
+    players = {}
+    for seat, entrant in enumerate(fixture.players, 1):
+        if entrant.command is None:
+            players[seat] = POLICIES[entrant.policy](random.Random(game_seed(fixture.seed, seat, fixture.id)))
+        else:
+            players[seat] = engine_player(entrant, game, history)
+    while game.winner is None and game.turn_number <= max_turns:
+        try:
+            action = players[game.turn](game)
+            apply(game, action)
+        except (EngineError, ValueError):
+            # a player that errors or answers with an illegal action loses the game
+            game.winner = 3 - game.turn
+            return Result(fixture.id, fixture.round, fixture.config, names, game.winner, game.turn_number, forfeit=True)
+        history.append(action)
+    return Result(fixture.id, fixture.round, fixture.config, names, game.winner, game.turn_number)
+
+
+def run_fixture(arguments: tuple[Fixture, SettingsData, int]) -> Result:
+    return play_fixture(*arguments)
+
+
+def settings_matrix(sizes: list[tuple[int, int]], barrier_densities: list[int], powerup_frequencies: list[int],
+                    base: SettingsData | None = None) -> list[SettingsData]:
+    base = base or SettingsData()
+    return [SettingsData(**asdict(base) | {"length": length, "width": width, "barrier_density": density,
+                                           "powerup_frequency": frequency})
+            for (length, width), density, frequency in product(sizes, barrier_densities, powerup_frequencies)]
+
+
+def fit_elo(names: list[str], results: list[Result], iterations: int = 50) -> tuple[np.ndarray, np.ndarray]:
+    # maximum-likelihood Bradley-Terry ratings; every player also draws once with a virtual average player,
+    # which keeps ratings finite for perfect scores and the Hessian invertible
+    index = {name: i for i, name in enumerate(names)}
+    games = [(index[result.players[0]], index[result.players[1]], result.score(result.players[0]))
+             for result in results if not result.generation_failed]
+    ratings = np.zeros(len(names))
+    hessian = -np.eye(len(names))
+    for _ in range(iterations):
+        expected = 1 / (1 + np.exp(-ratings))
+        gradient = 0.5 - expected
+        hessian = -np.diag(expected * (1 - expected))
+        for first, second, score in games:
+            p = 1 / (1 + math.exp(ratings[second] - ratings[first]))
+            gradient[first] += score - p
+            gradient[second] -= score - p
+            weight = p * (1 - p)
+            hessian[first, first] -= weight
+            hessian[second, second] -= weight
+            hessian[first, second] += weight
+            hessian[second, first] += weight
+        step = np.linalg.solve(hessian, gradient)
+        ratings -= step
+        if np.abs(step).max() < 1e-9:
+            break
+    deviations = np.sqrt(np.diag(np.linalg.inv(-hessian)))
+    return 1500 + ELO_SCALE * ratings, Z_95 * ELO_SCALE * deviations
+
+
+@dataclass
+class Standing:
+    name: str
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    elo: float
+    error: float
+
+    @property
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.0
+
+
+@dataclass
+class TournamentReport:
+    games: int
+    elapsed: float
+    forfeits: int
+    generation_failures: int
+    unplayed: int
+    standings: list[Standing]
+
+    @staticmethod
+    def from_results(entrants: list[Entrant], results: list[Result], elapsed: float, unplayed: int) -> TournamentReport:
+        names = [entrant.name for entrant in entrants]
+        played = [result for result in results if not result.generation_failed]
+        elo, error = fit_elo(names, played)
+        tallies = {name: [0, 0, 0] for name in names}
+        for result in played:
+            for name in result.players:
+                tallies[name][{1.0: 0, 0.5: 1, 0.0: 2}[result.score(name)]] += 1
+        standings = [Standing(name, sum(tallies[name]), *tallies[name], float(elo[i]), float(error[i]))
+                     for i, name in enumerate(names)]
+        return TournamentReport(len(played), elapsed, sum(result.forfeit for result in played),
+                                len(results) - len(played), unplayed,
+                                sorted(standings, key=lambda standing: standing.elo, reverse=True))
+
+    def __str__(self) -> str:
+        lines = [f"Games: {self.games} in {self.elapsed:.2f}s, forfeits {self.forfeits}, "
+                 f"boards that could not be generated {self.generation_failures}, unplayed {self.unplayed}"]
+        width = max([len(standing.name) for standing in self.standings] + [6])
+        lines.append(f"{'Player':<{width}}  {'Elo':>11}  {'Games':>5}  {'W':>4}  {'D':>4}  {'L':>4}  Score")
+        for standing in self.standings:
+            lines.append(f"{standing.name:<{width}}  {standing.elo:>4.0f} ± {standing.error:<4.0f}  "
+                         f"{standing.games:>5}  {standing.wins:>4}  {standing.draws:>4}  {standing.losses:>4}  "
+                         f"{standing.score:.1%}")
+        return "\n".join(lines)
+
+
+@dataclass
+class Tournament:
+    entrants: list[Entrant]
+    configs: list[SettingsData]
+    output: Path
+    format: str = "roundrobin"
+    rounds: int = 1
+    seed: int = 0
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    max_turns: int = 500
+    time_limit: float | None = None
+
+    def __post_init__(self) -> None:
+        if self.format not in ("roundrobin", "swiss"):
+            raise ValueError(f"Unknown tournament format '{self.format}'")
+        if len({entrant.name for entrant in self.entrants}) != len(self.entrants):
+            raise ValueError("Player names must be unique")
+        self.results_path = self.output / "results.jsonl"
+        self.results: dict[str, Result] = {}
+
+    def load(self) -> None:
+        # a run that was interrupted picks up where it stopped, a torn final line is played again
+        if not self.results_path.exists():
+            return
+        with self.results_path.open() as file:
+            for line in file:
+                try:
+                    result = Result(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                result.players = tuple(result.players)
+                self.results[result.id] = result
+
+    def pairings(self, round: int) -> list[tuple[Entrant, Entrant]]:
+        if self.format == "roundrobin":
+            return list(combinations(self.entrants, 2))
+        scores = defaultdict(float)
+        met = set()
+        for result in self.results.values():
+            if result.round < round and not result.generation_failed:
+                for name in result.players:
+                    scores[name] += result.score(name)
+                met.add(frozenset(result.players))
+        ranked = sorted(self.entrants, key=lambda entrant: (-scores[entrant.name], entrant.name))
+        pairs = []
+        while len(ranked) > 1:
+            first = ranked.pop(0)
+            # the highest ranked player not yet met, or the next in line if everyone has been
+            opponent = next((other for other in ranked if frozenset((first.name, other.name)) not in met), ranked[0])
+            ranked.remove(opponent)
+            pairs.append((first, opponent))
+        return pairs
+
+    def fixtures(self, round: int) -> list[Fixture]:
+        fixtures = []
+        for config in range(len(self.configs)):
+            for first, second in self.pairings(round):
+                # both colours play the same board
+                seed = game_seed(self.seed, round, str(config), *sorted((first.name, second.name)))
+                fixtures.append(Fixture(round, config, (first, second), seed))
+                fixtures.append(Fixture(round, config, (second, first), seed))
+        return fixtures
+
+    def run(self) -> TournamentReport:
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        self.output.mkdir(parents=True, exist_ok=True)
+        self.load()
+        unplayed = 0
+        with self.results_path.open("a") as file, multiprocessing.Pool(self.workers) as pool:
+            for round in range(self.rounds):
+                pending = [fixture for fixture in self.fixtures(round) if fixture.id not in self.results]
+                if unplayed:
+                    unplayed += len(pending)
+                    continue
+                tasks = [(fixture, self.configs[fixture.config], self.max_turns) for fixture in pending]
+                results = pool.imap_unordered(run_fixture, tasks)
+                for played in range(len(tasks)):
+                    try:
+                        result = results.next(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+                    except multiprocessing.TimeoutError:
+                        pool.terminate()
+                        unplayed = len(tasks) - played
+                        break
+                    self.results[result.id] = result
+                    file.write(json.dumps(asdict(result)) + "\n")
+                    file.flush()
+                    os.fsync(file.fileno())
+        return TournamentReport.from_results(self.entrants, list(self.results.values()),
+                                             time.perf_counter() - start, unplayed)
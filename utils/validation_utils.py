@@ -56,7 +56,7 @@ def get_valid_coord(prompt: str, length: int, width: int, exit_string: str = "c"
             print("Invalid coordinate format")
             continue
         coord = string_to_coord(coord)
-        if coord[0] < 0 or coord[0] >= width or coord[1] < 0 or coord[1] >= length:
+        if coord[0] < 0 or coord[0] >= length or coord[1] < 0 or coord[1] >= width:
             print("Coordinate is out of bounds")
             continue
         return coord
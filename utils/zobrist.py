@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from functools import cache
+from typing import Any
+
+import numpy as np
+
+from .constants import Cell
+
+MASK_64 = (1 << 64) - 1
+
+
+@cache
+def cell_keys(length: int, width: int) -> list[list[list[int]]]:
+    rng = random.Random(f"cells:{length}x{width}")
+    return [[[rng.getrandbits(64) for _ in Cell] for _ in range(width)] for _ in range(length)]
+
+
+@cache
+def cell_key_array(length: int, width: int) -> np.ndarray:
+    return np.array(cell_keys(length, width), dtype=np.uint64)
+
+
+@cache
+def portal_keys(length: int, width: int) -> list[list[int]]:
+    rng = random.Random(f"portals:{length}x{width}")
+    return [[rng.getrandbits(64) | 1 for _ in range(width)] for _ in range(length)]
+
+
+@cache
+def counter_key(*parts: Any) -> int:
+    return random.Random(repr(parts)).getrandbits(64)
+
+
+SIDE_KEY = counter_key("side")
+
+
+@dataclass
+class TranspositionTable:
+    capacity: int = 1 << 20
+    keys: list[int] = field(init=False)
+    entries: list[Any] = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.capacity & (self.capacity - 1):
+            raise ValueError("Transposition table capacity must be a power of two")
+        self.keys = [0] * self.capacity
+        self.entries = [None] * self.capacity
+        self.size = 0
+
+    def probe(self, key: int) -> Any:
+        index = key & (self.capacity - 1)
+        return self.entries[index] if self.keys[index] == key else None
+
+    def store(self, key: int, entry: Any) -> None:
+        index = key & (self.capacity - 1)
+        if self.entries[index] is None:
+            self.size += 1
+        self.keys[index] = key
+        self.entries[index] = entry
+
+    def clear(self) -> None:
+        self.__post_init__()
+
+    def __len__(self) -> int:
+        return self.size